@@ -0,0 +1,60 @@
+"""Measure cold-start cost per search mode: module import, engine construction and the first call.
+
+Each mode runs in a fresh interpreter so nothing is shared between measurements.
+Solr does not have to be up; an unreachable cluster only adds the connection error time.
+
+    python bench_cold_start.py [repeats]
+"""
+import json
+import subprocess
+import sys
+
+from bench_utils import add_backend_path, summarize
+
+QUERY_DIR = add_backend_path('query')
+
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+import query_solr_cloud
+imported = time.perf_counter()
+engine = query_solr_cloud.SolrCloudQueryEngine()
+constructed = time.perf_counter()
+try:
+    query_solr_cloud.handle_request(engine, json.loads(sys.argv[1]))
+except Exception as e:
+    print(f"first call failed: {e}", file=sys.stderr)
+finished = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "init_ms": (constructed - imported) * 1000,
+    "first_call_ms": (finished - constructed) * 1000,
+    "torch_loaded": "torch" in sys.modules,
+}))
+'''
+
+MODES = {
+    'simple_search': {'query': 'ukraine'},
+    'dsl_search': {'dsl_query': {'conditions': [{'field': 'title', 'operator': 'contains', 'value': 'news'}]}},
+    'autocomplete': {'query': 'gaza', 'autocomplete': True},
+    'semantic_search': {'query': 'election results', 'semantic_search': True},
+}
+
+
+def probe(args):
+    output = subprocess.run([sys.executable, '-c', PROBE, json.dumps(args)],
+                            cwd=QUERY_DIR, capture_output=True, text=True)
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main(repeats=3):
+    for mode, args in MODES.items():
+        runs = [probe(args) for _ in range(repeats)]
+        total = [r['import_ms'] + r['init_ms'] + r['first_call_ms'] for r in runs]
+        print(summarize(mode, total))
+        print(f"{'':<28} import={runs[-1]['import_ms']:.1f}ms init={runs[-1]['init_ms']:.1f}ms "
+              f"first_call={runs[-1]['first_call_ms']:.1f}ms torch_loaded={runs[-1]['torch_loaded']}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,97 @@
+"""Crawl throughput of the sequential crawler against the concurrent per-host scheduler,
+with extraction inline on the fetch threads and in the process-pool parse stage.
+
+Serves a few synthetic sites from local stand-in HTTP servers, one per host, each
+answering with a small delay so network wait dominates like it does on real sites.
+
+Raise paragraphs to make pages heavier, so extraction rather than the network dominates.
+
+    python bench_crawler.py [hosts] [pages_per_host] [crawl_delay] [paragraphs]
+"""
+import os
+import sys
+import tempfile
+import time
+from http.server import BaseHTTPRequestHandler
+
+from bench_utils import add_backend_path, start_stub_server, write_crawler_config
+
+add_backend_path('crawl')
+os.chdir(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'crawl'))
+
+from crawler import WebCrawler  # noqa: E402
+
+RESPONSE_DELAY = 0.02
+PAGES_PER_HOST = 20
+PARAGRAPHS = 1
+
+PARAGRAPH = ("Stand-in article text for the crawler benchmark with enough words to count as "
+             "a content block in the extractor. ") * 6
+
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        time.sleep(RESPONSE_DELAY)
+        if self.path == '/robots.txt':
+            self.send_body(404, b'', 'text/plain')
+            return
+        page = int(self.path.rsplit('/', 1)[-1] or 0) if self.path.startswith('/page/') else 0
+        article = f"<p>{PARAGRAPH}</p>" * PARAGRAPHS
+        links = ''.join(f'<a href="/page/{(page + step) % PAGES_PER_HOST}">next</a>' for step in (1, 2, 3))
+        html = (f"<html><head><title>Page {page}</title>"
+                f"<meta name=\"description\" content=\"page {page}\"></head>"
+                f"<body><h1>Heading {page}</h1><article>{article}</article>{links}</body></html>")
+        self.send_body(200, html.encode('utf-8'), 'text/html; charset=utf-8')
+
+    def send_body(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(label, crawler, crawl, start_urls, max_pages):
+    started = time.perf_counter()
+    data = crawl(start_urls, max_pages=max_pages)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} pages={len(data):<5} elapsed={elapsed:7.2f}s rate={len(data) / elapsed:7.1f} pages/s")
+    for stage, stats in crawler.stage_stats.summary().items():
+        print(f"    {stage:<6} n={stats['count']:<5} total={stats['total_seconds']:7.2f}s "
+              f"avg={stats['avg_ms']:8.2f}ms max={stats['max_ms']:8.2f}ms")
+
+
+def main(hosts=4, pages_per_host=20, crawl_delay=0.2, paragraphs=1):
+    global PAGES_PER_HOST, PARAGRAPHS
+    PAGES_PER_HOST = pages_per_host
+    PARAGRAPHS = paragraphs
+    servers = [start_stub_server(SiteHandler) for _ in range(hosts)]
+    start_urls = [f"{base_url}/page/0" for _, base_url in servers]
+    max_pages = hosts * pages_per_host
+
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = dict(crawl_delay=crawl_delay, follow_internal_links=True,
+                        checkpoint={'enabled': False}, incremental={'enabled': False},
+                        robots={'cache_path': None})
+        inline_config = write_crawler_config(os.path.join(tmp, 'inline.json'),
+                                             parse_pool={'enabled': False}, **settings)
+        pool_config = write_crawler_config(os.path.join(tmp, 'pool.json'),
+                                           parse_pool={'enabled': True}, **settings)
+        crawler = WebCrawler(inline_config)
+        run('sequential', crawler, crawler.crawl_site, start_urls, max_pages)
+        crawler = WebCrawler(inline_config)
+        run('concurrent', crawler, crawler.crawl_site_concurrent, start_urls, max_pages)
+        crawler = WebCrawler(pool_config)
+        run('concurrent+parse pool', crawler, crawler.crawl_site_concurrent, start_urls, max_pages)
+
+    for server, _ in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*(float(a) if i == 2 else int(a) for i, a in enumerate(sys.argv[1:5])))
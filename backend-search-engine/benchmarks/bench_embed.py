@@ -0,0 +1,57 @@
+"""Embedding throughput: one fixed-size model.encode call against the length-sorted,
+token-budget BatchEncoder, in-process and on a pool of encoder processes.
+
+Texts are built from the saved crawl in data/ exactly as generate_embeddings builds them.
+
+    python bench_embed.py [workers] [rounds]
+"""
+import os
+import sys
+import time
+
+from bench_utils import BACKEND_DIR, add_backend_path
+
+add_backend_path('embed')
+add_backend_path()
+
+from common.jsonl_io import iter_documents, find_latest_dataset  # noqa: E402
+from encoder import BatchEncoder  # noqa: E402
+from generate_embeddings import EMBEDDING_MODEL, SentenceTransformer, document_text  # noqa: E402
+
+
+def load_texts():
+    dataset = find_latest_dataset(os.path.join(BACKEND_DIR, 'data'), 'crawled_data_')
+    texts = (document_text(doc) for doc in iter_documents(dataset))
+    return [text for text in texts if text]
+
+
+def run(label, encode, texts, rounds):
+    encode(texts[:8])  # warm up
+    started = time.perf_counter()
+    for _ in range(rounds):
+        encode(texts)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<22} {len(texts) * rounds / elapsed:8.1f} docs/s")
+
+
+def main(workers=0, rounds=3):
+    texts = load_texts()
+    model = SentenceTransformer(EMBEDDING_MODEL)
+    print(f"{len(texts)} texts, {rounds} rounds")
+
+    run('fixed batch_size=32', lambda batch: model.encode(batch, batch_size=32, show_progress_bar=False),
+        texts, rounds)
+
+    encoder = BatchEncoder(model, EMBEDDING_MODEL)
+    run('length-sorted', encoder.encode, texts, rounds)
+
+    pool_encoder = BatchEncoder(model, EMBEDDING_MODEL, workers=workers)
+    run(f'process pool x{pool_encoder.workers}', pool_encoder.encode, texts, rounds)
+    pool_encoder.close()
+
+    for line in encoder.stats.report():
+        print(line)
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
@@ -0,0 +1,155 @@
+"""Extraction throughput (pages/sec, MB/sec) of each HTML extractor backend.
+
+Reads every *.html file in fixtures_dir. Without one, fixtures are synthesized from the
+saved crawl in data/ so page structure (nav, scripts, nested article/section blocks,
+many links) resembles the crawled news sites. Also reports pages where the backends'
+documents differ, and how similar their body text is.
+
+Synthesized pages are well-formed, so agreement on them says little about real markup:
+--fetch downloads the live pages of the saved crawl into fixtures_dir first, and
+--malformed damages every page the way real sites do (unclosed and stray end tags,
+mis-nesting, bare ampersands, missing </body>) before comparing.
+
+    python bench_extract.py [fixtures_dir] [rounds] [--fetch] [--malformed]
+"""
+import difflib
+import glob
+import hashlib
+import html
+import os
+import random
+import re
+import sys
+import time
+
+from bench_utils import BACKEND_DIR, add_backend_path
+
+add_backend_path('crawl')
+add_backend_path()
+
+from common.jsonl_io import iter_documents, find_latest_dataset  # noqa: E402
+from extractors import EXTRACTORS  # noqa: E402
+
+COMPARED_FIELDS = ('title', 'body', 'headings', 'meta_description', 'links')
+
+
+def synthesize_page(doc):
+    body = html.escape(doc.get('body', ''))
+    paragraphs = ''.join(f"<p>{body[i:i + 400]}</p>" for i in range(0, len(body), 400))
+    headings = ''.join(f"<h2>{html.escape(h)}</h2>" for h in doc.get('headings', [])[:20])
+    links = ''.join(f'<li><a href="{html.escape(link)}">link {i}</a></li>'
+                    for i, link in enumerate(doc.get('links', [])[:200]))
+    return (
+        "<!DOCTYPE html><html><head>"
+        f"<title>{html.escape(doc.get('title', ''))}</title>"
+        f"<meta name=\"description\" content=\"{html.escape(doc.get('meta_description', ''))}\">"
+        "<script>window.analytics = {track: function () { return 1 < 2; }};</script>"
+        "<style>body { font-family: sans-serif; }</style></head><body>"
+        f"<nav><ul>{links}</ul></nav><!-- main content -->"
+        f"<main><article><h1>{html.escape(doc.get('title', ''))}</h1>{headings}"
+        f"<section>{paragraphs}</section></article></main>"
+        "<footer><p>Footer text</p></footer></body></html>"
+    )
+
+
+def fetch_fixtures(fixtures_dir, user_agent='CustomSearchBot/1.0', timeout=10):
+    """Save the raw HTML of every page in the saved crawl to fixtures_dir"""
+    import requests
+
+    os.makedirs(fixtures_dir, exist_ok=True)
+    dataset = find_latest_dataset(os.path.join(BACKEND_DIR, 'data'), 'crawled_data_')
+    saved = 0
+    for doc in iter_documents(dataset):
+        path = os.path.join(fixtures_dir, hashlib.md5(doc['url'].encode()).hexdigest() + '.html')
+        if os.path.exists(path):
+            continue
+        try:
+            response = requests.get(doc['url'], headers={'User-Agent': user_agent}, timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"  skipped {doc['url']}: {str(e)}")
+            continue
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        saved += 1
+    print(f"saved {saved} pages to {fixtures_dir}")
+
+
+MALFORMATIONS = [
+    (re.compile(r'</(p|li|section|td|h2)>'), lambda m: ''),                      # unclosed blocks and headings
+    (re.compile(r'<section>'), lambda m: '</article><section>'),                 # end tag of an open ancestor
+    (re.compile(r'<p>'), lambda m: '<p><b><i>'),                                 # mis-nested inline tags
+    (re.compile(r'</p>'), lambda m: '</b></i></div></span></p>'),                # stray end tags
+    (re.compile(r'&amp;'), lambda m: '&'),                                       # bare ampersands
+    (re.compile(r'</body>\s*</html>\s*$'), lambda m: ''),                        # truncated document
+    (re.compile(r'<(h[1-6]|a|section)\b'), lambda m: '<' + m.group(1).upper()),  # upper-case tags
+]
+
+
+def malform(page, seed):
+    """page with a random half of the places each malformation applies to damaged"""
+    rng = random.Random(seed)
+    for pattern, replace in MALFORMATIONS:
+        page = pattern.sub(lambda m: replace(m) if rng.random() < 0.5 else m.group(0), page)
+    return page
+
+
+def load_fixtures(fixtures_dir=None):
+    if fixtures_dir:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, '*.html'))):
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                pages.append((f"file://{path}", f.read()))
+        return pages
+    dataset = find_latest_dataset(os.path.join(BACKEND_DIR, 'data'), 'crawled_data_')
+    return [(doc['url'], synthesize_page(doc)) for doc in iter_documents(dataset)]
+
+
+def body_similarity(a, b):
+    """Share of body words the two documents have in common, in order"""
+    return difflib.SequenceMatcher(None, a['body'].split(), b['body'].split(), autojunk=False).ratio()
+
+
+def main(fixtures_dir=None, rounds=3, fetch=False, malformed=False):
+    if fetch and fixtures_dir:
+        fetch_fixtures(fixtures_dir)
+    pages = load_fixtures(fixtures_dir)
+    if malformed:
+        pages = [(url, malform(page, n)) for n, (url, page) in enumerate(pages)]
+    if not pages:
+        print("No fixtures")
+        return
+    total_mb = sum(len(page.encode('utf-8')) for _, page in pages) / (1024 * 1024)
+    print(f"{len(pages)} pages, {total_mb:.2f} MB per round, {rounds} rounds")
+
+    outputs = {}
+    for name, extractor_class in EXTRACTORS.items():
+        extractor = extractor_class()
+        extractor.logger.disabled = True
+        started = time.perf_counter()
+        for _ in range(rounds):
+            outputs[name] = [extractor.extract(page, url) for url, page in pages]
+        elapsed = time.perf_counter() - started
+        print(f"{name:<6} {len(pages) * rounds / elapsed:9.1f} pages/s {total_mb * rounds / elapsed:8.2f} MB/s")
+
+    reference, candidate = outputs['soup'], outputs['lxml']
+    mismatches = [(a['url'], field) for a, b in zip(reference, candidate)
+                  for field in COMPARED_FIELDS if a[field] != b[field]]
+    print(f"field mismatches between backends: {len(mismatches)} "
+          f"on {len({url for url, _ in mismatches})} of {len(pages)} pages")
+    for field in COMPARED_FIELDS:
+        count = sum(1 for _, mismatched in mismatches if mismatched == field)
+        if count:
+            print(f"  {field:<18} {count} pages")
+    similarities = sorted(body_similarity(a, b) for a, b in zip(reference, candidate))
+    print(f"body similarity: min={similarities[0]:.3f} "
+          f"mean={sum(similarities) / len(similarities):.3f}")
+    for url, field in mismatches[:10]:
+        print(f"  {field}: {url}")
+
+
+if __name__ == "__main__":
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    main(positional[0] if positional else None, int(positional[1]) if len(positional) > 1 else 3,
+         fetch='--fetch' in flags, malformed='--malformed' in flags)
@@ -0,0 +1,103 @@
+"""Indexing throughput (docs/sec) of the sequential batch indexer against bulk_index.
+
+Runs stand-in Solr nodes that answer /admin/ping and /update, taking a fixed latency
+per request plus time proportional to the request size, roughly like a Solr node that
+is parsing and indexing the batch. Documents are the saved crawl in data/, repeated to
+the requested count, each with a random 384-dim embedding.
+
+    python bench_indexer.py [documents] [nodes]
+"""
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import numpy as np
+
+from bench_utils import BACKEND_DIR, add_backend_path, start_stub_server
+
+add_backend_path('indexer')
+add_backend_path()
+os.chdir(os.path.join(BACKEND_DIR, 'indexer'))
+
+from common.jsonl_io import iter_documents, find_latest_dataset  # noqa: E402
+from index_to_solr_cloud import SolrCloudIndexer  # noqa: E402
+
+REQUEST_LATENCY = 0.01      # seconds per /update request
+SECONDS_PER_MB = 0.05       # additional seconds per MB of request body
+
+
+class SolrHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    received = 0
+    commits = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        self.send_json({'status': 'OK'})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(REQUEST_LATENCY + len(body) / (1024 * 1024) * SECONDS_PER_MB)
+        payload = json.loads(body)
+        with SolrHandler.lock:
+            if isinstance(payload, list):
+                SolrHandler.received += len(payload)
+            else:
+                SolrHandler.commits.append(self.path)
+        self.send_json({'responseHeader': {'status': 0}})
+
+    def send_json(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def load_documents(count):
+    dataset = find_latest_dataset(os.path.join(BACKEND_DIR, 'data'), 'crawled_data_')
+    base = list(iter_documents(dataset))
+    rng = np.random.default_rng(0)
+    documents = []
+    for i, doc in enumerate(itertools.islice(itertools.cycle(base), count)):
+        doc = dict(doc, id=f"{doc['id']}-{i}")
+        doc['embedding_vector'] = rng.standard_normal(384, dtype=np.float32).tolist()
+        documents.append(doc)
+    return documents
+
+
+def run(label, index, documents):
+    SolrHandler.received = 0
+    SolrHandler.commits = []
+    started = time.perf_counter()
+    index(documents)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} docs={SolrHandler.received:<6} elapsed={elapsed:7.2f}s "
+          f"rate={SolrHandler.received / elapsed:8.1f} docs/s commits={SolrHandler.commits}")
+
+
+def main(documents=2000, nodes=3):
+    servers = [start_stub_server(SolrHandler) for _ in range(nodes)]
+    solr_urls = [f"{base_url}/solr/search_collection" for _, base_url in servers]
+    docs = load_documents(documents)
+
+    indexer = SolrCloudIndexer(solr_urls)
+    logging.getLogger().setLevel(logging.WARNING)
+    run('sequential', indexer.index_documents, docs)
+    run('bulk', indexer.bulk_index, docs)
+
+    for server, _ in servers:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main(*(int(a) for a in sys.argv[1:3]))
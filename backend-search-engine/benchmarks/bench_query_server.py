@@ -0,0 +1,116 @@
+"""Compare per-request latency of the process-per-request CLI against the warm query server.
+
+Needs a reachable SolrCloud (or any stand-in answering /admin/ping, /select and /suggest).
+
+    python bench_query_server.py [iterations]
+"""
+import base64
+import json
+import subprocess
+import sys
+import time
+
+from bench_utils import add_backend_path, summarize, timed
+
+QUERY_DIR = add_backend_path('query')
+
+from query_client import QueryClient  # noqa: E402
+
+PORT = 8799
+
+WORKLOAD = [
+    {'query': 'ukraine', 'start': 0, 'rows': 10},
+    {'query': 'climate', 'start': 10, 'rows': 10},
+    {'query': 'gaza', 'autocomplete': True, 'limit': 5},
+    {'dsl_query': {'conditions': [{'field': 'title', 'operator': 'contains', 'value': 'news'}],
+                   'start': 0, 'rows': 10}},
+    {'query': 'election results', 'semantic_search': True, 'start': 0, 'rows': 10},
+]
+
+
+def encode(args):
+    return base64.b64encode(json.dumps(args).encode('utf-8')).decode('ascii')
+
+
+def run_cli(args):
+    output = subprocess.run(
+        [sys.executable, 'query_solr_cloud.py', encode(args)],
+        cwd=QUERY_DIR, capture_output=True, text=True
+    )
+    return json.loads(output.stdout)
+
+
+def wait_for_server(client, timeout=120):
+    connection = client.get_connection()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            connection.request('GET', '/health')
+            if connection.getresponse().read():
+                return True
+        except OSError:
+            client.close()
+            connection = client.get_connection()
+            time.sleep(0.5)
+    return False
+
+
+def start_server(*flags):
+    server = subprocess.Popen([sys.executable, 'query_server.py', str(PORT), *flags], cwd=QUERY_DIR,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    client = QueryClient(port=PORT)
+    if not wait_for_server(client):
+        client.close()
+        server.terminate()
+        server.wait()
+        return None, None
+    # One warm-up pass so the model load is not counted against the server
+    for args in WORKLOAD:
+        client.query(args)
+    return server, client
+
+
+def stop_server(server, client):
+    client.close()
+    server.terminate()
+    server.wait()
+
+
+def run_server(name, iterations, *flags):
+    server, client = start_server(*flags)
+    if server is None:
+        print("Query server did not come up")
+        return None
+    try:
+        samples = []
+        for i in range(iterations):
+            _, elapsed = timed(client.query, WORKLOAD[i % len(WORKLOAD)])
+            samples.append(elapsed)
+        print(summarize(name, samples))
+
+        connection = client.get_connection()
+        connection.request('GET', '/stats')
+        return json.loads(connection.getresponse().read().decode('utf-8'))
+    finally:
+        stop_server(server, client)
+
+
+def main(iterations=20):
+    cli_samples = []
+    for i in range(iterations):
+        _, elapsed = timed(run_cli, WORKLOAD[i % len(WORKLOAD)])
+        cli_samples.append(elapsed)
+    print(summarize('cli (process per request)', cli_samples))
+
+    # The workload repeats, so the like-for-like comparison runs without the result cache:
+    # every request reaches Solr, as it does from the CLI
+    run_server('query server (warm)', iterations, '--no-result-cache')
+
+    # Reported separately: repeated requests are mostly answered from the result cache
+    stats = run_server('query server (result cache)', iterations)
+    if stats and 'result_cache' in stats:
+        print(f"result cache: {json.dumps(stats['result_cache'])}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,79 @@
+"""Solr payload size, search latency and serialization time of full vs lean responses.
+
+Full is the old profile (fl=*,score with debugQuery on every request); lean projects fl
+onto the fields format_response reads and computes explain output only on request.
+Needs a reachable SolrCloud.
+
+    python bench_response.py [iterations]
+"""
+import json
+import sys
+
+from bench_utils import add_backend_path, summarize, timed
+
+add_backend_path('query')
+
+from query_solr_cloud import SolrCloudQueryEngine, handle_request, serialize_response  # noqa: E402
+
+WORKLOAD = [
+    {'query': 'ukraine', 'start': 0, 'rows': 10},
+    {'query': 'climate', 'start': 10, 'rows': 10},
+    {'dsl_query': {'conditions': [{'field': 'title', 'operator': 'contains', 'value': 'news'}],
+                   'start': 0, 'rows': 10}},
+    {'query': 'election results', 'semantic_search': True, 'start': 0, 'rows': 10},
+]
+
+
+class CountingTransport:
+    """Wraps the engine's HTTP session and adds up the bytes of every Solr response"""
+
+    def __init__(self, http):
+        self.http = http
+        self.bytes = 0
+
+    def get(self, *args, **kwargs):
+        return self.count(self.http.get(*args, **kwargs))
+
+    def post(self, *args, **kwargs):
+        return self.count(self.http.post(*args, **kwargs))
+
+    def count(self, response):
+        self.bytes += len(response.content)
+        return response
+
+
+def run(name, engine, iterations):
+    transport = CountingTransport(engine.http)
+    engine.http = transport
+    # Warm-up pass so model loading is not counted
+    for args in WORKLOAD:
+        handle_request(engine, args)
+    transport.bytes = 0
+
+    search_samples, dumps_samples, json_samples = [], [], []
+    output_bytes = 0
+    for i in range(iterations):
+        result, elapsed = timed(handle_request, engine, WORKLOAD[i % len(WORKLOAD)])
+        search_samples.append(elapsed)
+        data, elapsed = timed(serialize_response, result)
+        dumps_samples.append(elapsed)
+        output_bytes += len(data)
+        _, elapsed = timed(json.dumps, result)
+        json_samples.append(elapsed)
+
+    print(summarize(f"{name} search", search_samples))
+    print(summarize(f"{name} serialize_response", dumps_samples))
+    print(summarize(f"{name} json.dumps", json_samples))
+    print(f"{name:<28} solr payload={transport.bytes / iterations / 1024:9.1f} KB/request "
+          f"output={output_bytes / iterations / 1024:9.1f} KB/request")
+
+
+def main(iterations=40):
+    engine = SolrCloudQueryEngine(lean=False)
+    run('full', engine, iterations)
+    engine = SolrCloudQueryEngine(embedding_provider=engine.embedding_provider, lean=True)
+    run('lean', engine, iterations)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40)
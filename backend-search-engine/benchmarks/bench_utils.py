@@ -0,0 +1,62 @@
+import math
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_backend_path(*parts):
+    """Make a backend stage directory (query, crawl, ...) importable from a benchmark"""
+    path = os.path.join(BACKEND_DIR, *parts)
+    if path not in sys.path:
+        sys.path.insert(0, path)
+    return path
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def summarize(name, samples_ms):
+    """Return a one-line latency summary for a list of millisecond samples"""
+    if not samples_ms:
+        return f"{name:<28} no samples"
+    mean = sum(samples_ms) / len(samples_ms)
+    return (f"{name:<28} n={len(samples_ms):<5} mean={mean:9.2f}ms "
+            f"p50={percentile(samples_ms, 50):9.2f}ms p99={percentile(samples_ms, 99):9.2f}ms")
+
+
+def timed(fn, *args, **kwargs):
+    """Call fn and return (result, elapsed milliseconds)"""
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - started) * 1000
+
+
+def start_stub_server(handler_class):
+    """Run a local HTTP server on a free port in a daemon thread; returns (server, base_url)"""
+    import threading
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def write_crawler_config(path, **overrides):
+    """Copy config/config.json to path with crawler settings overridden for a benchmark run"""
+    import json
+
+    with open(os.path.join(BACKEND_DIR, 'config', 'config.json'), 'r') as f:
+        config = json.load(f)
+    config.update(overrides)
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+    return path
@@ -0,0 +1,72 @@
+"""PrefixIndex under concurrent request threads: lookups and record() calls running side by
+side never fail on the shared suggestion memo, and recorded searches outlive a rebuild.
+
+No Solr needed; exits non-zero on the first failed check.
+
+    python check_prefix_index.py [calls per thread]
+"""
+import os
+import random
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'query'))
+
+from prefix_index import PrefixIndex  # noqa: E402
+
+TITLES = 5000
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"ok   {message}")
+
+
+def check_concurrent_lookup_and_record(calls):
+    titles = [(f"news item {n}", None) for n in range(TITLES)]
+    index = PrefixIndex(lambda since: titles)
+    index.build()
+    errors = []
+
+    def lookups():
+        try:
+            for _ in range(calls):
+                # Prefixes wide enough to be memoized, with varying limits
+                index.lookup(f"news item {random.randint(1, 9)}", random.randint(1, 50))
+        except Exception as e:
+            errors.append(e)
+
+    def records():
+        try:
+            for _ in range(calls):
+                index.record(f"news item {random.randrange(TITLES)}")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=target) for target in (lookups, lookups, records, records)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check(not errors, f"4 threads x {calls} lookups/records without errors {errors[:1]}")
+    check(sum(index.entries[2]) == TITLES + 2 * calls, "every recorded search raised a weight")
+
+
+def check_searches_survive_rebuild():
+    titles = [('Alpha news', None), ('Alpha news', None), ('Alpha story', None)]
+    index = PrefixIndex(lambda since: titles)
+    index.build()
+    check(index.lookup('alpha') == ['Alpha news', 'Alpha story'], "document counts rank suggestions")
+    for _ in range(3):
+        index.record('alpha story')
+    check(index.lookup('alpha')[0] == 'Alpha story', "recorded searches promote a suggestion")
+    index.build()
+    check(index.lookup('alpha')[0] == 'Alpha story', "recorded searches survive a rebuild")
+
+
+if __name__ == "__main__":
+    check_concurrent_lookup_and_record(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
+    check_searches_survive_rebuild()
+    print("all checks passed")
@@ -0,0 +1,119 @@
+"""Semantic search paging against a stand-in Solr: every page up to the last one is reachable
+while the kNN candidate list grows, and a passage query that Solr rejects is only tried once
+per query instead of on every page.
+
+No Solr or embedding model needed; exits non-zero on the first failed check.
+
+    python check_semantic_paging.py
+"""
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'query'))
+
+import requests  # noqa: E402
+
+from query_solr_cloud import SolrCloudQueryEngine, handle_request, parse_json, serialize_response  # noqa: E402
+
+NEIGHBOURS = 330
+ROWS = 10
+
+
+class StubVector(list):
+    def tolist(self):
+        return list(self)
+
+
+class StubEmbeddingProvider:
+    model_name = 'stub'
+
+    def encode(self, text):
+        return StubVector([1.0, 0.0])
+
+
+class StubResponse:
+    def __init__(self, payload, status=200):
+        self.content = serialize_response(payload)
+        self.status_code = status
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error", response=self)
+
+
+class StubSolr:
+    """Answers kNN queries with NEIGHBOURS ranked documents and id fetches with their ids;
+    rejects passage queries like a schema without passage_vector"""
+
+    def __init__(self, neighbours=NEIGHBOURS):
+        self.neighbours = neighbours
+        self.requests = []
+
+    def post(self, url, data=None, **kwargs):
+        params = dict(data)
+        if 'passage_knn' in params:
+            self.requests.append('passage_knn')
+            return StubResponse({'error': {'msg': 'undefined field passage_vector'}}, status=400)
+        if params['q'].startswith('{!knn'):
+            self.requests.append('knn')
+            top_k = int(params['rows'])
+            docs = [{'id': f"doc{n}", 'score': 1.0 - n / 1000} for n in range(min(top_k, self.neighbours))]
+            return StubResponse({'responseHeader': {'status': 0},
+                                 'response': {'numFound': len(docs), 'docs': docs},
+                                 'facet_counts': {}})
+        self.requests.append('fetch')
+        ids = params['q'].split('}', 1)[1].split(',')
+        return StubResponse({'responseHeader': {'status': 0},
+                             'response': {'numFound': len(ids), 'docs': [{'id': doc_id} for doc_id in ids]}})
+
+
+def make_engine(solr, passage_search=False):
+    engine = SolrCloudQueryEngine(embedding_provider=StubEmbeddingProvider(), passage_search=passage_search)
+    engine.http = solr
+    for url in engine.solr_urls:
+        engine.node_health.record(url, True)
+    return engine
+
+
+def check(condition, message):
+    if not condition:
+        print(f"FAIL {message}")
+        sys.exit(1)
+    print(f"ok   {message}")
+
+
+def check_every_page_reachable():
+    engine = make_engine(StubSolr())
+    page = 1
+    while True:
+        result = handle_request(engine, {'query': 'q', 'semantic_search': True,
+                                         'start': (page - 1) * ROWS, 'rows': ROWS})
+        expected = [f"doc{n}" for n in range((page - 1) * ROWS, min(page * ROWS, NEIGHBOURS))]
+        if [doc['id'] for doc in result['docs']] != expected:
+            check(False, f"page {page} returns documents {expected[0]}..{expected[-1]}")
+        if page == 1:
+            check(result['numFound'] > 100, f"page 1 announces more than 100 results ({result['numFound']})")
+        pages = math.ceil(result['numFound'] / ROWS)
+        if page >= pages:
+            break
+        page += 1
+    check(page == math.ceil(NEIGHBOURS / ROWS), f"pager reaches the last page ({page})")
+    check(result['numFound'] == NEIGHBOURS, f"numFound settles at the real total ({result['numFound']})")
+
+
+def check_passage_fallback_cached():
+    solr = StubSolr()
+    engine = make_engine(solr, passage_search=True)
+    for page in range(5):
+        result = engine.semantic_search('q', start=page * ROWS, rows=ROWS)
+        check(len(result['response']['docs']) == ROWS, f"passage fallback page {page + 1} has {ROWS} documents")
+    check(solr.requests.count('passage_knn') == 1,
+          f"rejected passage query sent once ({solr.requests.count('passage_knn')})")
+    check(solr.requests.count('knn') == 1, f"document kNN sent once ({solr.requests.count('knn')})")
+
+
+if __name__ == "__main__":
+    check_every_page_reachable()
+    check_passage_fallback_cached()
+    print("all checks passed")
@@ -0,0 +1,18 @@
+import json
+import os
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'config.json')
+
+
+def load_config(config_path=CONFIG_PATH):
+    """The shared backend config, or an empty dict when it is missing"""
+    try:
+        with open(config_path, 'r') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def load_section(name, config_path=CONFIG_PATH):
+    """One top-level section of the shared config, or an empty dict"""
+    return load_config(config_path).get(name, {})
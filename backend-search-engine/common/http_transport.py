@@ -0,0 +1,108 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from common.config import CONFIG_PATH, load_section
+
+DEFAULT_OPTIONS = {
+    'pool_connections': 10,
+    'pool_maxsize': 10,
+    'max_retries': 2,
+    'backoff_factor': 0.2,
+    'status_forcelist': [502, 503, 504]
+}
+
+
+class HttpTransport:
+    """One requests.Session with keep-alive pools per host, retries with backoff and gzip.
+
+    urllib3 keeps a separate connection pool for every host the session talks to, so a
+    single transport covers all Solr nodes or all crawled hosts.
+    """
+
+    def __init__(self, pool_connections=10, pool_maxsize=10, max_retries=2, backoff_factor=0.2,
+                 status_forcelist=(502, 503, 504), headers=None):
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=list(status_forcelist),
+            raise_on_status=False
+        )
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        if headers:
+            self.session.headers.update(headers)
+
+    def get(self, url, **kwargs):
+        return self.session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.session.post(url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def stats(self):
+        """Requests sent versus TCP connections opened, per host pool"""
+        pools = self.adapter.poolmanager.pools
+        hosts = {}
+        total_requests = 0
+        total_connections = 0
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            requests_sent = pool.num_requests
+            connections = pool.num_connections
+            total_requests += requests_sent
+            total_connections += connections
+            hosts[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+                'requests': requests_sent,
+                'connections_opened': connections,
+                'connections_reused': max(0, requests_sent - connections)
+            }
+        return {
+            'requests': total_requests,
+            'connections_opened': total_connections,
+            'connections_reused': max(0, total_requests - total_connections),
+            'hosts': hosts
+        }
+
+    def close(self):
+        self.session.close()
+
+
+_transports = {}
+_transports_lock = threading.Lock()
+
+
+def load_http_config(name, config_path=CONFIG_PATH):
+    """Options for a named transport from the http section of config.json"""
+    http_config = load_section('http', config_path)
+    options = dict(DEFAULT_OPTIONS)
+    options.update(http_config.get('default', {}))
+    options.update(http_config.get(name, {}))
+    return options
+
+
+def get_transport(name='default', **overrides):
+    """Process-wide transport shared by every caller that asks for the same name"""
+    with _transports_lock:
+        transport = _transports.get(name)
+        if transport is None:
+            options = load_http_config(name)
+            options.update(overrides)
+            transport = HttpTransport(**options)
+            _transports[name] = transport
+        return transport
+
+
+def transport_stats():
+    with _transports_lock:
+        return {name: transport.stats() for name, transport in _transports.items()}
@@ -0,0 +1,50 @@
+import json
+import os
+import threading
+import time
+
+
+class IndexGeneration:
+    """Counter that the indexer bumps after every commit, kept in a small JSON file.
+
+    Readers such as the query server's result cache compare generations to find out
+    whether the index changed. current() only stats the file, re-reading it when its
+    modification time changes, so it is cheap enough to call on every request.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._generation = 0
+
+    def read(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return int(json.load(f).get('generation', 0))
+        except (OSError, ValueError):
+            return 0
+
+    def current(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return 0
+        with self._lock:
+            if mtime != self._mtime:
+                self._generation = self.read()
+                self._mtime = mtime
+            return self._generation
+
+    def bump(self):
+        """Record a commit; returns the new generation"""
+        with self._lock:
+            generation = self.read() + 1
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'generation': generation, 'committed_at': time.time()}, f)
+            os.replace(tmp_path, self.path)
+            return generation
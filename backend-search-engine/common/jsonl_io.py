@@ -0,0 +1,173 @@
+import glob
+import gzip
+import json
+import os
+import re
+
+PART_PATTERN = re.compile(r'^(?P<prefix>.+)-(?P<part>\d{5})\.jsonl(?:\.gz)?$')
+DATASET_SUFFIXES = ('.json', '.jsonl', '.jsonl.gz')
+SIDECAR_SUFFIXES = ('.index.json',)
+
+
+def open_text(path, mode='r'):
+    """Open a text file, transparently gzip-compressed when the name ends in .gz"""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def dataset_files(path):
+    """Files that make up a dataset: the file itself, or every rotated part of a prefix"""
+    if os.path.isfile(path):
+        return [path]
+    return sorted(glob.glob(glob.escape(path) + '-[0-9][0-9][0-9][0-9][0-9].jsonl*'))
+
+
+def iter_json_array(f, chunk_size=1 << 16):
+    """Yield the elements of a top-level JSON array one at a time, reading f in chunks.
+
+    Only the element being decoded is held in memory, so an array file of any size
+    streams like JSONL does.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+    started = False
+
+    while True:
+        # Skip whitespace and separators up to the next value
+        while pos < len(buffer) and (buffer[pos].isspace() or (started and buffer[pos] == ',')):
+            pos += 1
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                # A value that runs to the end of the buffer may continue in the next chunk
+                if end < len(buffer) or eof:
+                    yield value
+                    pos = end
+                    continue
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+        elif eof:
+            raise ValueError("Unterminated JSON array")
+
+        # Drop what was consumed and read more; grow reads so huge values decode in few passes
+        buffer = buffer[pos:]
+        pos = 0
+        chunk = f.read(max(chunk_size, len(buffer)))
+        if not chunk:
+            eof = True
+        buffer += chunk
+
+
+def iter_documents(path):
+    """Yield documents from a JSON array file, a JSONL(.gz) file or a rotated JSONL dataset prefix"""
+    for file_path in dataset_files(path):
+        if file_path.endswith('.json'):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                for document in iter_json_array(f):
+                    yield document
+            continue
+        with open_text(file_path) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+
+def find_latest_dataset(data_dir, prefix=''):
+    """Newest dataset in data_dir; rotated JSONL parts are grouped back under their prefix"""
+    candidates = set()
+    for name in os.listdir(data_dir):
+        if not name.startswith(prefix) or not name.endswith(DATASET_SUFFIXES) or name.endswith(SIDECAR_SUFFIXES):
+            continue
+        match = PART_PATTERN.match(name)
+        candidates.add(match.group('prefix') if match else name)
+    if not candidates:
+        return None
+    latest = max(candidates, key=lambda name: re.sub(r'\.jsonl?(\.gz)?$', '', name))
+    return os.path.join(data_dir, latest)
+
+
+class MemorySink(list):
+    """Collects documents in a list; the default sink when no output file is streamed"""
+
+    def write(self, document):
+        self.append(document)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonlSink:
+    """Appends documents to JSONL files as they arrive, rotating to a new part by size.
+
+    Only buffer_size documents are held in memory; everything else is already on disk.
+    Parts are named <prefix>-00001.jsonl, <prefix>-00002.jsonl, ... (.gz when compressed).
+    """
+
+    def __init__(self, prefix, compress=False, max_file_bytes=None, buffer_size=50):
+        self.prefix = prefix
+        self.compress = compress
+        self.max_file_bytes = max_file_bytes
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.files = []
+        self.count = 0
+        self.part = 0
+        self.file = None
+        self.file_bytes = 0
+
+        directory = os.path.dirname(prefix)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def open_next_part(self):
+        if self.file:
+            self.file.close()
+        self.part += 1
+        path = f"{self.prefix}-{self.part:05d}.jsonl" + ('.gz' if self.compress else '')
+        self.file = open_text(path, 'w')
+        self.file_bytes = 0
+        self.files.append(path)
+
+    def write(self, document):
+        self.buffer.append(json.dumps(document, ensure_ascii=False) + '\n')
+        self.count += 1
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        for line in self.buffer:
+            if self.file is None or (self.max_file_bytes and self.file_bytes >= self.max_file_bytes):
+                self.open_next_part()
+            self.file.write(line)
+            self.file_bytes += len(line.encode('utf-8'))
+        self.buffer = []
+        if self.file:
+            self.file.flush()
+
+    def close(self):
+        self.flush()
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
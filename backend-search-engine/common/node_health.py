@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common.http_transport import get_transport
+
+
+class NodeHealthTracker:
+    """Remembers the last known health of each Solr node and routes requests to a healthy one.
+
+    Nodes are pinged in the background (start()) or lazily once their state is older
+    than ttl, and immediately marked down when a real request against them fails.
+    """
+
+    def __init__(self, solr_urls, ttl=30, timeout=2, strategy='round_robin', check_interval=10, http=None):
+        self.solr_urls = list(solr_urls)
+        # No retries on pings: a dead node should be reported after one timeout
+        self.http = http or get_transport('solr_health', max_retries=0)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.strategy = strategy
+        self.check_interval = check_interval
+        self.logger = logging.getLogger(__name__)
+
+        self.states = {url: {'healthy': None, 'response_time': None, 'checked_at': 0, 'error': None}
+                       for url in self.solr_urls}
+        self.next_index = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def configure(self, config):
+        """Apply the solr.node_health section of config.json"""
+        self.ttl = config.get('ttl', self.ttl)
+        self.timeout = config.get('timeout', self.timeout)
+        self.strategy = config.get('strategy', self.strategy)
+        self.check_interval = config.get('check_interval', self.check_interval)
+
+    def check_node(self, url):
+        """Ping one node and record the result"""
+        try:
+            response = self.http.get(f"{url}/admin/ping", timeout=self.timeout)
+            healthy = response.status_code == 200
+            self.record(url, healthy, response.elapsed.total_seconds(),
+                        None if healthy else f"HTTP {response.status_code}")
+        except requests.exceptions.RequestException as e:
+            # Only log the transition, not every background check of a node that stays down
+            if self.states[url]['healthy'] is not False:
+                self.logger.error(f"Solr node {url} is unreachable: {str(e)}")
+            self.record(url, False, None, str(e))
+
+    def check_all(self):
+        """Ping every node concurrently so one dead node costs a single timeout"""
+        with ThreadPoolExecutor(max_workers=len(self.solr_urls)) as pool:
+            list(pool.map(self.check_node, self.solr_urls))
+
+    def record(self, url, healthy, response_time=None, error=None):
+        with self._lock:
+            self.states[url] = {
+                'healthy': healthy,
+                'response_time': response_time,
+                'checked_at': time.time(),
+                'error': error
+            }
+
+    def mark_failure(self, url, error=None):
+        """A request against url failed; stop routing to it until it passes a ping"""
+        if url in self.states:
+            self.record(url, False, None, str(error) if error else 'request failed')
+            self.logger.warning(f"Marked Solr node {url} unhealthy")
+
+    def is_stale(self):
+        now = time.time()
+        with self._lock:
+            return any(now - state['checked_at'] > self.ttl for state in self.states.values())
+
+    def get_url(self):
+        """Return a healthy node URL, refreshing stale state first when no background checker runs"""
+        if self._thread is None and self.is_stale():
+            self.check_all()
+
+        with self._lock:
+            healthy = [url for url in self.solr_urls if self.states[url]['healthy']]
+            if not healthy:
+                self.logger.warning("No active Solr nodes found, returning first URL. Request may fail.")
+                return self.solr_urls[0]
+
+            if self.strategy == 'latency':
+                return min(healthy, key=lambda url: self.states[url]['response_time'] or 0)
+
+            url = healthy[self.next_index % len(healthy)]
+            self.next_index += 1
+            return url
+
+    def cluster_status(self):
+        """Last known state of every node, without any network round trip"""
+        status = {}
+        with self._lock:
+            for i, url in enumerate(self.solr_urls):
+                state = self.states[url]
+                node = {
+                    "url": url,
+                    "status": "active" if state['healthy'] else "inactive"
+                }
+                if state['response_time'] is not None:
+                    node["response_time"] = state['response_time']
+                if state['error']:
+                    node["error"] = state['error']
+                if state['checked_at']:
+                    node["checked_at"] = state['checked_at']
+                status[f"node_{i+1}"] = node
+        return status
+
+    def start(self, check_interval=None):
+        """Keep node state fresh from a daemon thread"""
+        if self._thread is not None:
+            return
+        if check_interval is not None:
+            self.check_interval = check_interval
+        self.check_all()
+
+        def run():
+            while not self._stop.wait(self.check_interval):
+                try:
+                    self.check_all()
+                except Exception as e:
+                    self.logger.error(f"Error checking Solr nodes: {str(e)}")
+
+        self._thread = threading.Thread(target=run, name='solr-node-health', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+            self._thread = None
@@ -0,0 +1,3 @@
+# Root documents of the index; passages are nested children of these. Every query that is
+# not a passage block join filters on it, and so does the indexer's document count
+PARENT_FILTER = '*:* -_nest_path_:*'
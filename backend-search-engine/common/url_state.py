@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class UrlStateStore:
+    """Per-URL validators kept across crawls: ETag, Last-Modified, content hash and links.
+
+    Unlike the crawl checkpoint this is never cleared, so every crawl can send conditional
+    requests and recognise pages whose content did not change since the previous cycle.
+    A page only counts as unchanged once the indexer has confirmed its content hash: the
+    indexer marks the hashes it sends as pending and promotes them to indexed_hash after
+    a successful commit, so pages whose embed or index stage failed are crawled again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS url_state (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                links TEXT,
+                fetched_at REAL,
+                pending_hash TEXT,
+                indexed_hash TEXT
+            )
+        ''')
+        columns = {row[1] for row in self.connection.execute('PRAGMA table_info(url_state)')}
+        for column in ('pending_hash', 'indexed_hash'):
+            if column not in columns:
+                # State written before index confirmation existed; its pages get re-emitted once
+                self.connection.execute(f'ALTER TABLE url_state ADD COLUMN {column} TEXT')
+        self.connection.commit()
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            row = self.connection.execute(
+                'SELECT etag, last_modified, content_hash, links, indexed_hash FROM url_state WHERE url = ?', (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_hash': row[2],
+            'links': json.loads(row[3]) if row[3] else [],
+            'indexed_hash': row[4]
+        }
+
+    @staticmethod
+    def is_indexed(state):
+        """True when the content last fetched for a URL is confirmed to be in the index"""
+        return bool(state and state.get('content_hash') and state.get('indexed_hash') == state['content_hash'])
+
+    def conditional_headers(self, state):
+        """If-None-Match / If-Modified-Since for a previously fetched URL whose content is
+        confirmed indexed; otherwise the body is needed again"""
+        headers = {}
+        if self.is_indexed(state):
+            if state.get('etag'):
+                headers['If-None-Match'] = state['etag']
+            if state.get('last_modified'):
+                headers['If-Modified-Since'] = state['last_modified']
+        return headers
+
+    def update(self, url, etag=None, last_modified=None, content_hash=None, links=None):
+        with self._lock:
+            # Upsert, so the indexer's pending and indexed hashes survive a re-crawl
+            self.connection.execute(
+                'INSERT INTO url_state (url, etag, last_modified, content_hash, links, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET etag = excluded.etag, last_modified = excluded.last_modified, '
+                'content_hash = excluded.content_hash, links = excluded.links, fetched_at = excluded.fetched_at',
+                (url, etag, last_modified, content_hash, json.dumps(links or []), time.time()))
+            self.connection.commit()
+
+    def touch(self, url):
+        with self._lock:
+            self.connection.execute('UPDATE url_state SET fetched_at = ? WHERE url = ?', (time.time(), url))
+            self.connection.commit()
+
+    def mark_pending(self, pairs):
+        """(url, content_hash) of documents sent to Solr, not yet confirmed by a commit"""
+        with self._lock:
+            self.connection.executemany('UPDATE url_state SET pending_hash = ? WHERE url = ?',
+                                        [(content_hash, url) for url, content_hash in pairs])
+            self.connection.commit()
+
+    def discard_pending(self, urls):
+        """Documents that failed to index stay unconfirmed and are crawled in full next time"""
+        with self._lock:
+            self.connection.executemany('UPDATE url_state SET pending_hash = NULL WHERE url = ?',
+                                        [(url,) for url in urls])
+            self.connection.commit()
+
+    def clear_pending(self):
+        """Nothing of this run was committed; its pages stay unconfirmed"""
+        with self._lock:
+            self.connection.execute('UPDATE url_state SET pending_hash = NULL WHERE pending_hash IS NOT NULL')
+            self.connection.commit()
+
+    def confirm_pending(self):
+        """After a successful commit: pending hashes become indexed; returns how many"""
+        with self._lock:
+            cursor = self.connection.execute(
+                'UPDATE url_state SET indexed_hash = pending_hash, pending_hash = NULL '
+                'WHERE pending_hash IS NOT NULL')
+            self.connection.commit()
+            return cursor.rowcount
+
+    def close(self):
+        self.connection.close()
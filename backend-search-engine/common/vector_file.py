@@ -0,0 +1,130 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+VECTOR_DTYPES = ('float32', 'float16', 'int8')
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+NPY_HEADER_SIZE = 128   # fixed, so the row count can be rewritten in place when the file is closed
+
+
+def vector_paths(prefix):
+    """(.npy matrix, id/row index sidecar) that belong to a dataset prefix"""
+    return f"{prefix}.vectors.npy", f"{prefix}.vectors.index.json"
+
+
+def write_npy_header(f, dtype, shape):
+    header = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.dtype(dtype).str, shape)
+    header = header.ljust(NPY_HEADER_SIZE - len(NPY_MAGIC) - 2 - 1) + '\n'
+    f.seek(0)
+    f.write(NPY_MAGIC + struct.pack('<H', len(header)) + header.encode('latin1'))
+
+
+class VectorWriter:
+    """Appends vectors to a .npy matrix as they are produced, one row per document.
+
+    float16 halves the file; int8 quarters it, with one float32 scale per row kept
+    in the sidecar so rows can be restored to approximately their original values.
+    The sidecar maps every document id to its row.
+    """
+
+    def __init__(self, prefix, dtype='float32', model=None):
+        if dtype not in VECTOR_DTYPES:
+            raise ValueError(f"Unsupported vector dtype: {dtype}")
+        self.matrix_path, self.index_path = vector_paths(prefix)
+        self.dtype = dtype
+        self.model = model
+        self.dimension = None
+        self.ids = []
+        self.scales = []
+        directory = os.path.dirname(self.matrix_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(self.matrix_path, 'wb')
+
+    def append(self, doc_id, vector):
+        """Write one vector; returns its row number"""
+        vector = np.asarray(vector, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = len(vector)
+            write_npy_header(self.file, self.dtype, (0, self.dimension))
+        elif len(vector) != self.dimension:
+            raise ValueError(f"Vector for {doc_id} has {len(vector)} dimensions, expected {self.dimension}")
+
+        if self.dtype == 'int8':
+            scale = float(np.abs(vector).max()) / 127 or 1.0
+            self.scales.append(scale)
+            row = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        else:
+            row = vector.astype(self.dtype, copy=False)
+        self.file.write(row.tobytes())
+        self.ids.append(doc_id)
+        return len(self.ids) - 1
+
+    def close(self):
+        if self.file is None:
+            return
+        write_npy_header(self.file, self.dtype, (len(self.ids), self.dimension or 0))
+        self.file.close()
+        self.file = None
+
+        index = {
+            'model': self.model,
+            'dtype': self.dtype,
+            'dimension': self.dimension,
+            'count': len(self.ids),
+            'ids': self.ids
+        }
+        if self.dtype == 'int8':
+            index['scales'] = self.scales
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class VectorFile:
+    """Read side of VectorWriter: the matrix is memory-mapped, so rows are read from the
+    page cache without loading or parsing the whole file"""
+
+    def __init__(self, prefix):
+        self.matrix_path, self.index_path = vector_paths(prefix)
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        self.model = index.get('model')
+        self.dtype = index['dtype']
+        self.ids = index['ids']
+        self.scales = np.asarray(index['scales'], dtype=np.float32) if 'scales' in index else None
+        self.matrix = np.load(self.matrix_path, mmap_mode='r')
+        self._rows = None
+
+    @classmethod
+    def for_dataset(cls, prefix):
+        """VectorFile next to a dataset, or None when its vectors are stored inline"""
+        if not os.path.exists(vector_paths(prefix)[1]):
+            return None
+        return cls(prefix)
+
+    def row_of(self, doc_id):
+        if self._rows is None:
+            self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        return self._rows.get(doc_id)
+
+    def vector(self, row):
+        """float32 vector of a row; a view into the mapped file when stored as float32"""
+        values = self.matrix[row]
+        if self.dtype == 'float32':
+            return values
+        if self.scales is not None:
+            return values.astype(np.float32) * self.scales[row]
+        return values.astype(np.float32)
+
+    def __len__(self):
+        return len(self.ids)
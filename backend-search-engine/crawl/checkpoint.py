@@ -0,0 +1,91 @@
+import json
+import os
+import sqlite3
+import threading
+
+QUEUED = 'queued'
+VISITED = 'visited'
+FAILED = 'failed'
+
+
+class CrawlCheckpoint:
+    """SQLite record of the frontier, visited URLs and extracted documents of one crawl.
+
+    Every state change is committed as it happens, so a crawl that dies part-way can be
+    restarted and continues with the URLs that were still queued, without refetching.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                status TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS urls_status ON urls (status, seq);
+            CREATE TABLE IF NOT EXISTS documents (
+                url TEXT PRIMARY KEY,
+                seq INTEGER NOT NULL,
+                data TEXT NOT NULL
+            );
+        ''')
+        self.connection.commit()
+        self._lock = threading.Lock()
+        self.seq = self.connection.execute('SELECT COALESCE(MAX(seq), 0) FROM urls').fetchone()[0]
+
+    def record_queued(self, url):
+        with self._lock:
+            self.seq += 1
+            self.connection.execute('INSERT OR IGNORE INTO urls (url, seq, status) VALUES (?, ?, ?)',
+                                    (url, self.seq, QUEUED))
+            self.connection.commit()
+
+    def record_result(self, url, document=None):
+        """Mark url as crawled and store its extracted document, if any"""
+        with self._lock:
+            self.seq += 1
+            self.connection.execute(
+                'INSERT INTO urls (url, seq, status) VALUES (?, ?, ?) '
+                'ON CONFLICT(url) DO UPDATE SET status = excluded.status',
+                (url, self.seq, VISITED if document else FAILED))
+            if document:
+                self.connection.execute('INSERT OR REPLACE INTO documents (url, seq, data) VALUES (?, ?, ?)',
+                                        (url, self.seq, json.dumps(document, ensure_ascii=False)))
+            self.connection.commit()
+
+    def queued_urls(self):
+        """URLs that were queued but not crawled yet, in the order they were queued"""
+        rows = self.connection.execute('SELECT url FROM urls WHERE status = ? ORDER BY seq', (QUEUED,))
+        return [row[0] for row in rows]
+
+    def seen_urls(self):
+        return (row[0] for row in self.connection.execute('SELECT url FROM urls'))
+
+    def visited_urls(self):
+        return {row[0] for row in self.connection.execute('SELECT url FROM urls WHERE status = ?', (VISITED,))}
+
+    def documents(self):
+        rows = self.connection.execute('SELECT data FROM documents ORDER BY seq')
+        for row in rows:
+            yield json.loads(row[0])
+
+    def is_empty(self):
+        return self.connection.execute('SELECT 1 FROM urls LIMIT 1').fetchone() is None
+
+    def clear(self):
+        """Forget the finished crawl so the next run starts from the seed URLs"""
+        with self._lock:
+            self.connection.execute('DELETE FROM urls')
+            self.connection.execute('DELETE FROM documents')
+            self.connection.commit()
+            self.seq = 0
+
+    def close(self):
+        self.connection.close()
@@ -1,13 +1,24 @@
-import requests
-from bs4 import BeautifulSoup
 import json
 import time
 import logging
-from urllib.parse import urljoin, urlparse
-from urllib.robotparser import RobotFileParser
+from urllib.parse import urlparse
 import os
 from datetime import datetime
 import hashlib
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.http_transport import get_transport
+from common.jsonl_io import JsonlSink, MemorySink
+from common.url_state import UrlStateStore
+from checkpoint import CrawlCheckpoint
+from extractors import get_extractor
+from frontier import CrawlFrontier, BloomFilter, canonicalize_url
+from parse_pool import DeferredUrl, FetchedPage, ParsePool, StageStats, decode_body
+from robots import RobotsCache
+from scheduler import HostScheduler
 
 class WebCrawler:
     def __init__(self, config_path='../config/config.json'):
@@ -15,8 +26,30 @@ class WebCrawler:
             self.config = json.load(f)
         
         self.setup_logging()
+        # Keep-alive pool per crawled host; retries come from the crawler's max_retries setting
+        self.http = get_transport('crawler', max_retries=self.config.get('max_retries', 3))
+        self.extractor = get_extractor(self.config.get('extractor', 'lxml'))
+        self.stage_stats = StageStats()
         self.visited_urls = set()
-        self.robots_cache = {}
+        self.robots_deferrals = {}   # url -> expiry of each failed robots.txt fetch it waited for
+
+        robots_config = self.config.get('robots', {})
+        self.robots = RobotsCache(self.http, self.config['user_agent'],
+                                  path=robots_config.get('cache_path', '../data/robots_cache.sqlite'),
+                                  ttl=robots_config.get('ttl', 86400),
+                                  error_ttl=robots_config.get('error_ttl', 30),
+                                  timeout=robots_config.get('timeout', 5),
+                                  prefetch_workers=robots_config.get('prefetch_workers', 4))
+
+        incremental_config = self.config.get('incremental', {})
+        self.url_state = None
+        if incremental_config.get('enabled', False):
+            self.url_state = UrlStateStore(incremental_config.get('state_path', '../data/url_state.sqlite'))
+
+        checkpoint_config = self.config.get('checkpoint', {})
+        self.checkpoint = None
+        if checkpoint_config.get('enabled', False):
+            self.checkpoint = CrawlCheckpoint(checkpoint_config.get('path', '../data/crawl_checkpoint.sqlite'))
         
     def setup_logging(self):
         logging.basicConfig(
@@ -31,95 +64,121 @@ class WebCrawler:
     
     def can_fetch(self, url):
         """Check if URL can be fetched according to robots.txt"""
-        parsed_url = urlparse(url)
-        base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        
-        if base_url not in self.robots_cache:
-            robots_url = urljoin(base_url, '/robots.txt')
-            rp = RobotFileParser()
-            rp.set_url(robots_url)
-            try:
-                rp.read()
-                self.robots_cache[base_url] = rp
-            except:
-                self.robots_cache[base_url] = None
-        
-        robots_parser = self.robots_cache[base_url]
-        if robots_parser:
-            return robots_parser.can_fetch(self.config['user_agent'], url)
-        return True
+        if not self.config.get('respect_robots_txt', True):
+            return True
+        return self.robots.can_fetch(url)
+
+    def robots_retry_in(self, url):
+        """Seconds to wait before url can be tried again when its host's robots.txt is
+        unavailable, or None to go ahead (or give up once max_deferrals robots.txt fetches
+        for it have failed)"""
+        if not self.config.get('respect_robots_txt', True):
+            return None
+        rules = self.robots.unavailable_rules(url)
+        if rules is None:
+            self.robots_deferrals.pop(url, None)
+            return None
+        failed_fetches = self.robots_deferrals.setdefault(url, set())
+        failed_fetches.add(rules.expires_at)
+        if len(failed_fetches) > self.config.get('robots', {}).get('max_deferrals', 5):
+            return None
+        return max(0.0, rules.expires_at - time.time())
+
+    def defer(self, frontier, deferred):
+        self.logger.info(f"robots.txt unavailable, retrying in {deferred.retry_in:.0f}s: {deferred.url}")
+        frontier.defer(deferred.url)
+
+    def crawl_delay_for(self, url):
+        """Seconds to wait between fetches from url's host: the robots.txt Crawl-delay
+        (capped by max_crawl_delay) when it is longer than the configured crawl_delay"""
+        delay = self.config.get('crawl_delay', 1)
+        if not self.config.get('respect_robots_txt', True):
+            return delay
+        robots_delay = self.robots.crawl_delay(url)
+        if robots_delay is None:
+            return delay
+        return max(delay, min(robots_delay, self.config.get('robots', {}).get('max_crawl_delay', 30)))
     
     def extract_content(self, html, url):
         """Extract relevant content from HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Extract title
-        title = soup.find('title')
-        title_text = title.get_text().strip() if title else ''
-        
-        # Extract meta description
-        meta_desc = soup.find('meta', attrs={'name': 'description'})
-        meta_description = meta_desc.get('content', '') if meta_desc else ''
-        
-        # Extract headings
-        headings = []
-        for h in soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6']):
-            headings.append(h.get_text().strip())
-        
-        # Extract body text
-        body = soup.find('body')
-        if body:
-            body_text = body.get_text()
-        else:
-            body_text = soup.get_text()
-        
-        # Clean up body text
-        # lines = (line.strip() for line in body_text.splitlines())
-        # chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-        # body_text = ' '.join(chunk for chunk in chunks if chunk)
-        
-        body_text = ' '.join(part.strip() for part in body_text.split() if part.strip())
+        return self.extractor.extract(html, url)
+    
+    def create_frontier(self, queue=None):
+        """Frontier with an exact seen-set, or a Bloom filter for very large crawls"""
+        frontier_config = self.config.get('frontier', {})
+        seen = None
+        if frontier_config.get('bloom_filter', False):
+            seen = BloomFilter(frontier_config.get('expected_urls', 1000000),
+                               frontier_config.get('false_positive_rate', 0.001))
+        return CrawlFrontier(queue=queue, seen=seen)
 
+    def add_to_frontier(self, frontier, url):
+        queued = frontier.add(url)
+        if queued and self.checkpoint:
+            self.checkpoint.record_queued(queued)
+        if queued and self.config.get('respect_robots_txt', True):
+            # Have the host's rules ready by the time its URL is scheduled
+            self.robots.prefetch(queued)
 
-        content_blocks = []
-        for tag in soup.find_all(['article', 'section', 'main']):
-            text = tag.get_text(separator=' ', strip=True)
-            if len(text.split()) >= 30:
-                content_blocks.append(text)
+    def seed_frontier(self, frontier, start_urls, sink):
+        """Queue the start URLs, or restore an interrupted crawl from the checkpoint.
+        Documents already extracted by the interrupted run are replayed into sink;
+        returns how many there were."""
+        if self.checkpoint and not self.checkpoint.is_empty():
+            for url in self.checkpoint.seen_urls():
+                frontier.mark_seen(url)
+            for url in self.checkpoint.queued_urls():
+                frontier.requeue(url)
+            self.visited_urls.update(self.checkpoint.visited_urls())
+            restored = 0
+            for document in self.checkpoint.documents():
+                sink.write(document)
+                restored += 1
+            self.logger.info(f"Resuming crawl from {self.checkpoint.path}: "
+                             f"{restored} documents, {len(frontier)} URLs queued")
+            return restored
 
-        if not content_blocks:
-            self.logger.warning(f"Falling back to <body>.")
-            body_tag = soup.find('body')
-            body_text = body_tag.get_text(separator= ' ', strip=True) if body_tag else soup.get_text(separator=' ', strip=True)
+        for url in start_urls:
+            self.add_to_frontier(frontier, url)
+        return 0
 
-        else: 
-            body_text= '\n\n'.join(content_blocks)
+    def record_result(self, url, content):
+        if self.checkpoint:
+            self.checkpoint.record_result(url, content)
 
-        # Extract links
-        links = []
-        for link in soup.find_all('a', href=True):
-            absolute_url = urljoin(url, link['href'])
-            links.append(absolute_url)
-        
+    def enqueue_links(self, frontier, url, links):
+        """Add internal links of a crawled page to the frontier"""
+        if not self.config.get('follow_internal_links', False):
+            return
+        host = urlparse(url).netloc
+        for link in links:
+            link = canonicalize_url(link)
+            if urlparse(link).netloc == host:
+                self.add_to_frontier(frontier, link)
+
+    def unchanged_document(self, url, state):
+        """Stub for a page that did not change since the last crawl; embedding and indexing skip it"""
         return {
             'url': url,
-            'title': title_text,
-            'body': body_text[:5000],  # Limit body text
-            'headings': headings,
-            'meta_description': meta_description,
-            'links': links,
-            'crawl_date': datetime.now().isoformat(),
-            'id': hashlib.md5(url.encode()).hexdigest()
+            'id': hashlib.md5(url.encode()).hexdigest(),
+            'unchanged': True,
+            'content_hash': state.get('content_hash'),
+            'links': state.get('links', []),
+            'crawl_date': datetime.now().isoformat()
         }
-    
-    def crawl_url(self, url):
-        """Crawl a single URL"""
+
+    def fetch_url(self, url):
+        """Fetch a single URL without extracting it. Returns a FetchedPage, the stub document
+        of an unchanged page, a DeferredUrl while its host's robots.txt cannot be fetched,
+        or None when the URL is skipped or fails"""
+        url = canonicalize_url(url)
         if url in self.visited_urls:
             return None
+
+        # A transient robots.txt failure postpones the URL; it is not a disallow
+        retry_in = self.robots_retry_in(url)
+        if retry_in is not None:
+            return DeferredUrl(url, retry_in)
         
         if not self.can_fetch(url):
             self.logger.info(f"Robots.txt disallows crawling: {url}")
@@ -131,52 +190,202 @@ class WebCrawler:
                 'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8'
             }
             
-            response = requests.get(url, headers=headers, timeout=10)
+            # Incremental mode: ask the server to skip the body when nothing changed
+            state = self.url_state.get(url) if self.url_state else None
+            headers.update(self.url_state.conditional_headers(state) if self.url_state else {})
+
+            started = time.perf_counter()
+            response = self.http.get(url, headers=headers, timeout=self.config.get('timeout', 10))
+            body = response.content
+            self.stage_stats.record('fetch', time.perf_counter() - started)
             response.raise_for_status()
+
+            if response.status_code == 304 and UrlStateStore.is_indexed(state):
+                self.visited_urls.add(url)
+                self.url_state.touch(url)
+                self.logger.info(f"Not modified: {url}")
+                return self.unchanged_document(url, state)
             
             if 'text/html' not in response.headers.get('content-type', ''):
                 return None
             
             self.visited_urls.add(url)
-            content = self.extract_content(response.text, url)
-            
-            self.logger.info(f"Successfully crawled: {url}")
-            return content
+            content_hash = hashlib.sha256(body).hexdigest()
+            # Only content the indexer confirmed is skipped; anything else is emitted again
+            if UrlStateStore.is_indexed(state) and state['content_hash'] == content_hash:
+                self.url_state.update(url, response.headers.get('ETag'), response.headers.get('Last-Modified'),
+                                      content_hash, state['links'])
+                self.logger.info(f"Unchanged content: {url}")
+                return self.unchanged_document(url, state)
+
+            return FetchedPage(url, body, response.encoding, response.headers.get('ETag'),
+                               response.headers.get('Last-Modified'), content_hash)
             
         except Exception as e:
             self.logger.error(f"Error crawling {url}: {str(e)}")
             return None
-    
-    def crawl_site(self, start_urls, max_pages=100):
-        """Crawl multiple URLs"""
-        crawled_data = []
-        urls_to_crawl = list(start_urls)
-        crawled_count = 0
+
+    def complete_page(self, page, content):
+        """Attach the content hash to an extracted document and remember the page's validators"""
+        content['content_hash'] = page.content_hash
+        if self.url_state:
+            self.url_state.update(page.url, page.etag, page.last_modified, page.content_hash, content['links'])
+        self.logger.info(f"Successfully crawled: {page.url}")
+        return content
+
+    def crawl_url(self, url):
+        """Crawl a single URL"""
+        page = self.fetch_url(url)
+        if not isinstance(page, FetchedPage):
+            return page
+
+        try:
+            started = time.perf_counter()
+            content = self.extract_content(decode_body(page.body, page.encoding), page.url)
+            self.stage_stats.record('parse', time.perf_counter() - started)
+            return self.complete_page(page, content)
+        except Exception as e:
+            self.logger.error(f"Error crawling {page.url}: {str(e)}")
+            return None
+
+    def parsed_document(self, page, future):
+        """Collect a document extracted by the parse pool"""
+        try:
+            content, parse_seconds = future.result()
+            self.stage_stats.record('parse', parse_seconds)
+            return self.complete_page(page, content)
+        except Exception as e:
+            self.logger.error(f"Error crawling {page.url}: {str(e)}")
+            return None
+
+    def write_document(self, sink, content):
+        started = time.perf_counter()
+        sink.write(content)
+        self.stage_stats.record('write', time.perf_counter() - started)
+
+    def crawl_site(self, start_urls, max_pages=100, sink=None):
+        """Crawl multiple URLs; documents go to sink (a list by default) as they are extracted"""
+        crawled_data = sink if sink is not None else MemorySink()
+        frontier = self.create_frontier()
+        crawled_count = self.seed_frontier(frontier, start_urls, crawled_data)
         
-        while urls_to_crawl and crawled_count < max_pages:
-            url = urls_to_crawl.pop(0)
+        while frontier and crawled_count < max_pages:
+            url = frontier.next_url()
             
             content = self.crawl_url(url)
+            if isinstance(content, DeferredUrl):
+                self.defer(frontier, content)
+                time.sleep(min(content.retry_in, self.config.get('crawl_delay', 1)))
+                continue
+            self.record_result(url, content)
             if content:
-                crawled_data.append(content)
+                self.write_document(crawled_data, content)
                 crawled_count += 1
                 
                 # Add internal links to crawl queue
-                if self.config.get('follow_internal_links', False):
-                    for link in content['links']:
-                        parsed_link = urlparse(link)
-                        parsed_start = urlparse(url)
-                        
-                        if (parsed_link.netloc == parsed_start.netloc and 
-                            link not in self.visited_urls and 
-                            link not in urls_to_crawl):
-                            urls_to_crawl.append(link)
+                self.enqueue_links(frontier, url, content['links'])
             
             # Respect crawl delay
-            time.sleep(self.config.get('crawl_delay', 1))
+            time.sleep(self.crawl_delay_for(url))
         
+        self.logger.info(f"Crawl stage timings: {self.stage_stats.summary()}")
         return crawled_data
     
+    def create_parse_pool(self):
+        """Process pool for HTML extraction when enabled in the parse_pool section of config.json"""
+        pool_config = self.config.get('parse_pool', {})
+        if not pool_config.get('enabled', False):
+            return None
+        return ParsePool(workers=pool_config.get('workers'),
+                         extractor=self.config.get('extractor', 'lxml'),
+                         max_pending=pool_config.get('max_pending'))
+
+    def crawl_site_concurrent(self, start_urls, max_pages=100, max_workers=None, sink=None, parse_pool=None):
+        """Crawl multiple URLs on a thread pool, applying crawl_delay per host instead of globally.
+
+        With a parse pool, the fetch threads only download pages and extraction runs in the
+        pool's worker processes; new fetches wait while the pool's backlog is full."""
+        max_workers = max_workers or self.config.get('max_workers', 8)
+        scheduler = HostScheduler(self.config.get('crawl_delay', 1))
+        frontier = self.create_frontier(queue=scheduler)
+        crawled_data = sink if sink is not None else MemorySink()
+        crawled_count = self.seed_frontier(frontier, start_urls, crawled_data)
+        owns_pool = parse_pool is None
+        parse_pool = parse_pool or self.create_parse_pool()
+        fetch = self.fetch_url if parse_pool else self.crawl_url
+        max_pending = parse_pool.max_pending if parse_pool else 0
+        in_flight = {}   # fetch future -> url
+        parsing = {}     # parse future -> FetchedPage
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                while (len(frontier) or in_flight or parsing) and crawled_count < max_pages:
+                    # Fill free workers with URLs from hosts whose delay has elapsed
+                    backlog_full = parse_pool is not None and len(parsing) >= max_pending
+                    while (len(in_flight) < max_workers and not backlog_full
+                           and crawled_count + len(in_flight) + len(parsing) < max_pages):
+                        url = frontier.next_url()
+                        if url is None:
+                            break
+                        in_flight[pool.submit(fetch, url)] = url
+
+                    if not in_flight and not parsing:
+                        wait_for = scheduler.seconds_until_ready()
+                        if wait_for is None:
+                            break
+                        time.sleep(wait_for)
+                        continue
+
+                    # With free workers, also wake up when the next host becomes ready
+                    saturated = (len(in_flight) >= max_workers or backlog_full
+                                 or crawled_count + len(in_flight) + len(parsing) >= max_pages)
+                    timeout = None if saturated else scheduler.seconds_until_ready()
+                    done, _ = wait(list(in_flight) + list(parsing), timeout=timeout, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        if future in in_flight:
+                            url = in_flight.pop(future)
+                            content = future.result()
+                            delay = self.crawl_delay_for(url)
+                            if isinstance(content, DeferredUrl):
+                                # Hold the whole host until its robots.txt is due to be fetched again
+                                delay = max(delay, content.retry_in)
+                            scheduler.set_delay(scheduler.host_of(url), delay)
+                            scheduler.release(url)
+                            if isinstance(content, DeferredUrl):
+                                self.defer(frontier, content)
+                                continue
+                            if isinstance(content, FetchedPage):
+                                parsing[parse_pool.submit(content)] = content
+                                continue
+                        else:
+                            page = parsing.pop(future)
+                            url = page.url
+                            content = self.parsed_document(page, future)
+
+                        self.record_result(url, content)
+                        if not content or crawled_count >= max_pages:
+                            continue
+                        self.write_document(crawled_data, content)
+                        crawled_count += 1
+
+                        # Add internal links to crawl queue
+                        self.enqueue_links(frontier, url, content['links'])
+        finally:
+            if parse_pool and owns_pool:
+                parse_pool.close()
+
+        self.logger.info(f"Crawl stage timings: {self.stage_stats.summary()}")
+        return crawled_data
+
+    def create_sink(self):
+        """Streaming JSONL sink for the crawl, configured by the output section of config.json"""
+        output_config = self.config.get('output', {})
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return JsonlSink(f"../data/crawled_data_{timestamp}",
+                         compress=output_config.get('compress', False),
+                         max_file_bytes=output_config.get('max_file_bytes'),
+                         buffer_size=output_config.get('buffer_size', 50))
+
     def save_data(self, data, filename=None):
         """Save crawled data to JSON file"""
         if not filename:
@@ -200,8 +409,19 @@ if __name__ == "__main__":
         "https://www.theguardian.com/world"
     ]
     
-    crawled_data = crawler.crawl_site(start_urls, max_pages=150)
-    crawler.save_data(crawled_data)
+    crawl = crawler.crawl_site_concurrent if crawler.config.get('concurrent', False) else crawler.crawl_site
+
+    if crawler.config.get('output', {}).get('format') == 'jsonl':
+        with crawler.create_sink() as sink:
+            crawl(start_urls, max_pages=150, sink=sink)
+        crawler.logger.info(f"Streamed {sink.count} documents to {', '.join(sink.files)}")
+    else:
+        crawled_data = crawl(start_urls, max_pages=150)
+        crawler.save_data(crawled_data)
+
+    # The crawl finished and is saved; the next run starts from the seed URLs again
+    if crawler.checkpoint:
+        crawler.checkpoint.clear()
 
 
 
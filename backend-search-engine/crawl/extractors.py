@@ -0,0 +1,216 @@
+import hashlib
+import logging
+from datetime import datetime
+from urllib.parse import urljoin
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+BLOCK_TAGS = ('article', 'section', 'main')
+SKIPPED_TAGS = ('script', 'style')
+MIN_BLOCK_WORDS = 30
+MAX_BODY_CHARS = 5000
+
+
+def has_min_words(parts, minimum):
+    """True once the stripped text parts hold at least minimum words; stops counting early"""
+    count = 0
+    for part in parts:
+        count += len(part.split())
+        if count >= minimum:
+            return True
+    return False
+
+
+def build_document(url, title, body, headings, meta_description, links):
+    return {
+        'url': url,
+        'title': title,
+        'body': body[:MAX_BODY_CHARS],  # Limit body text
+        'headings': headings,
+        'meta_description': meta_description,
+        'links': links,
+        'crawl_date': datetime.now().isoformat(),
+        'id': hashlib.md5(url.encode()).hexdigest()
+    }
+
+
+class BaseExtractor:
+    """Turns one HTML page into the crawler's document dict"""
+
+    name = None
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+
+    def extract(self, html, url):
+        raise NotImplementedError
+
+
+class SoupExtractor(BaseExtractor):
+    """Original BeautifulSoup/html.parser extraction; slow but tolerant"""
+
+    name = 'soup'
+
+    def extract(self, html, url):
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+
+        # Extract title
+        title = soup.find('title')
+        title_text = title.get_text().strip() if title else ''
+
+        # Extract meta description
+        meta_desc = soup.find('meta', attrs={'name': 'description'})
+        meta_description = meta_desc.get('content', '') if meta_desc else ''
+
+        # Extract headings
+        headings = []
+        for h in soup.find_all(list(HEADING_TAGS)):
+            headings.append(h.get_text().strip())
+
+        content_blocks = []
+        for tag in soup.find_all(list(BLOCK_TAGS)):
+            text = tag.get_text(separator=' ', strip=True)
+            if len(text.split()) >= MIN_BLOCK_WORDS:
+                content_blocks.append(text)
+
+        if not content_blocks:
+            self.logger.warning(f"Falling back to <body>.")
+            body_tag = soup.find('body')
+            body_text = body_tag.get_text(separator=' ', strip=True) if body_tag else soup.get_text(separator=' ', strip=True)
+        else:
+            body_text = '\n\n'.join(content_blocks)
+
+        # Extract links
+        links = []
+        for link in soup.find_all('a', href=True):
+            absolute_url = urljoin(url, link['href'])
+            links.append(absolute_url)
+
+        return build_document(url, title_text, body_text, headings, meta_description, links)
+
+
+class LxmlExtractor(BaseExtractor):
+    """Collects title, meta description, headings, content blocks, body text and links
+    in a single walk over an lxml tree. On well-formed markup the document matches
+    SoupExtractor's; on broken markup libxml2 repairs the tree like a browser does
+    (an unclosed heading ends at the next one instead of swallowing it), so headings
+    and block boundaries can differ. bench_extract.py --malformed measures how much"""
+
+    name = 'lxml'
+
+    def parse(self, html):
+        import lxml.html
+
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # lxml refuses str input that still carries an XML encoding declaration
+            return lxml.html.document_fromstring(html.encode('utf-8'))
+
+    def extract(self, html, url):
+        from lxml import etree
+
+        try:
+            root = self.parse(html)
+        except etree.ParserError:
+            return build_document(url, '', '', [], '', [])
+
+        title_text = None
+        meta_description = None
+        headings = []
+        blocks = []          # (start position, stripped strings) of every article/section/main
+        links = []
+        body_parts = None    # stripped strings inside the first <body>
+        in_body = False
+        all_parts = []       # stripped strings of the whole document, used when there is no body
+        open_captures = []   # [element, kind, raw strings, start position]; text goes to all of them
+
+        def add_text(text):
+            if not text:
+                return
+            for capture in open_captures:
+                capture[2].append(text)
+            stripped = text.strip()
+            if stripped:
+                all_parts.append(stripped)
+                if in_body:
+                    body_parts.append(stripped)
+
+        events = ('start', 'end', 'comment', 'pi')
+        for position, (event, element) in enumerate(etree.iterwalk(root, events=events)):
+            tag = element.tag if isinstance(element.tag, str) else None
+
+            if event in ('comment', 'pi'):
+                # Comments contribute no text of their own, but the text after them does
+                add_text(element.tail)
+                continue
+
+            if event == 'start':
+                # script/style contribute no text of their own
+                if tag is None or tag in SKIPPED_TAGS:
+                    continue
+                if tag == 'title' and title_text is None:
+                    open_captures.append([element, 'title', [], position])
+                elif tag in HEADING_TAGS:
+                    open_captures.append([element, 'heading', [], position])
+                elif tag in BLOCK_TAGS:
+                    open_captures.append([element, 'block', [], position])
+                elif tag == 'body' and body_parts is None:
+                    body_parts = []
+                    in_body = True
+                elif tag == 'meta' and meta_description is None and element.get('name') == 'description':
+                    meta_description = element.get('content', '')
+                elif tag == 'a':
+                    href = element.get('href')
+                    if href is not None:
+                        links.append(urljoin(url, href))
+                add_text(element.text)
+                continue
+
+            # End event: close this element's captures; its tail text belongs to the parent
+            if tag is not None:
+                while open_captures and open_captures[-1][0] is element:
+                    _, kind, parts, started = open_captures.pop()
+                    if kind == 'title':
+                        title_text = ''.join(parts).strip()
+                    elif kind == 'heading':
+                        headings.append(''.join(parts).strip())
+                    else:
+                        blocks.append((started, [part.strip() for part in parts if part.strip()]))
+                if tag == 'body':
+                    in_body = False
+            if element is not root:
+                add_text(element.tail)
+
+        # Nested blocks close before their parents; restore document order like find_all
+        blocks.sort(key=lambda block: block[0])
+        content_blocks = [' '.join(parts) for _, parts in blocks if has_min_words(parts, MIN_BLOCK_WORDS)]
+
+        if not content_blocks:
+            self.logger.warning(f"Falling back to <body>.")
+            body_text = ' '.join(body_parts if body_parts is not None else all_parts)
+        else:
+            body_text = '\n\n'.join(content_blocks)
+
+        return build_document(url, title_text or '', body_text, headings, meta_description or '', links)
+
+
+EXTRACTORS = {
+    'soup': SoupExtractor,
+    'lxml': LxmlExtractor,
+}
+
+
+def get_extractor(name='lxml'):
+    """Extractor by name; falls back to BeautifulSoup when lxml is not installed"""
+    if name == 'lxml':
+        try:
+            import lxml.html  # noqa: F401
+        except ImportError:
+            name = 'soup'
+    return EXTRACTORS.get(name, LxmlExtractor)()
@@ -0,0 +1,126 @@
+import hashlib
+import math
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonicalize_url(url):
+    """Canonical form of a URL that is fetched: fragment dropped, scheme/host lowercased,
+    default port removed, empty path as '/'. The query string is kept byte for byte"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if ':' in host:
+        # IPv6 literal; hostname strips the brackets the netloc needs
+        host = f"[{host}]"
+    netloc = host
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port and port != DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{port}"
+    if parts.username:
+        netloc = f"{parts.username}{':' + parts.password if parts.password else ''}@{netloc}"
+    path = parts.path or '/'
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+
+
+def url_key(url):
+    """Dedupe key: the canonical URL with its query parameters sorted, so parameter-order
+    variants of a page share one key. Only compared, never fetched"""
+    canonical = canonicalize_url(url)
+    parts = urlsplit(canonical)
+    if not parts.query:
+        return canonical
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit(parts._replace(query=query))
+
+
+class BloomFilter:
+    """Fixed-size probabilistic set for crawls too large for an exact seen-set.
+
+    False positives mean a small fraction of new URLs is skipped; there are no false negatives.
+    """
+
+    def __init__(self, expected_items=1000000, false_positive_rate=0.001):
+        self.size = max(8, int(-expected_items * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, int(round(self.size / expected_items * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self):
+        return self.count
+
+
+class FifoQueue:
+    """Plain breadth-first queue with the same add/next_url interface as HostScheduler"""
+
+    def __init__(self):
+        self.urls = deque()
+
+    def add(self, url):
+        self.urls.append(url)
+
+    def next_url(self, now=None):
+        return self.urls.popleft() if self.urls else None
+
+    def __len__(self):
+        return len(self.urls)
+
+
+class CrawlFrontier:
+    """Queue of URLs still to crawl plus a seen-store over their dedupe keys.
+
+    Every URL is canonicalized once on add; add and next_url are O(1) and a URL
+    (or any fragment/parameter-order variant of it) is only ever queued once.
+    """
+
+    def __init__(self, queue=None, seen=None):
+        self.queue = queue if queue is not None else FifoQueue()
+        self.seen = seen if seen is not None else set()
+
+    def add(self, url):
+        """Queue url unless its canonical form was seen before; returns the queued URL or None"""
+        key = url_key(url)
+        if key in self.seen:
+            return None
+        self.seen.add(key)
+        url = canonicalize_url(url)
+        self.queue.add(url)
+        return url
+
+    def mark_seen(self, url):
+        self.seen.add(url_key(url))
+
+    def requeue(self, url):
+        """Queue an already-seen canonical URL again, e.g. when resuming from a checkpoint"""
+        self.seen.add(url_key(url))
+        self.queue.add(url)
+
+    def defer(self, url):
+        """Queue a popped URL again without consulting the seen-store, e.g. while its host's
+        robots.txt cannot be fetched"""
+        self.queue.add(url)
+
+    def next_url(self, now=None):
+        return self.queue.next_url(now)
+
+    def __len__(self):
+        return len(self.queue)
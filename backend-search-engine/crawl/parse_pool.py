@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from extractors import get_extractor
+
+# A fetched page waiting for extraction: the raw response body plus what is needed to finish it
+FetchedPage = namedtuple('FetchedPage', ['url', 'body', 'encoding', 'etag', 'last_modified', 'content_hash'])
+# A URL not fetched because its host's robots.txt is unavailable; try again after retry_in seconds
+DeferredUrl = namedtuple('DeferredUrl', ['url', 'retry_in'])
+
+_worker_extractor = None
+
+
+def decode_body(body, encoding):
+    """Response text the same way requests builds response.text"""
+    return str(body, encoding or 'utf-8', errors='replace')
+
+
+def init_worker(extractor_name):
+    global _worker_extractor
+    _worker_extractor = get_extractor(extractor_name)
+
+
+def parse_page(url, body, encoding):
+    """Run in a worker process: extract one page; returns (document, parse seconds)"""
+    started = time.perf_counter()
+    document = _worker_extractor.extract(decode_body(body, encoding), url)
+    return document, time.perf_counter() - started
+
+
+class ParsePool:
+    """Worker processes that run HTML extraction, so parsing uses every core instead of
+    competing with the fetch threads for the GIL.
+
+    max_pending bounds how many fetched pages may wait for a worker; the crawl loop stops
+    starting new fetches while the pool is that far behind.
+    """
+
+    def __init__(self, workers=None, extractor='lxml', max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                            initargs=(extractor,))
+        self.max_pending = max_pending or self.workers * 4
+
+    def submit(self, page):
+        return self.executor.submit(parse_page, page.url, page.body, page.encoding)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class StageStats:
+    """Call count and time spent per crawl stage (fetch, parse, write)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            count, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (count + 1, total + seconds, max(longest, seconds))
+
+    def summary(self):
+        with self._lock:
+            return {
+                stage: {
+                    'count': count,
+                    'total_seconds': round(total, 3),
+                    'avg_ms': round(total / count * 1000, 2) if count else 0.0,
+                    'max_ms': round(longest * 1000, 2)
+                }
+                for stage, (count, total, longest) in self.stages.items()
+            }
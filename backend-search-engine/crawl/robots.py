@@ -0,0 +1,183 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+FETCH_ERROR = 0              # stored status for robots.txt fetches that got no HTTP response
+MAX_ROBOTS_BYTES = 500 * 1024
+
+
+def robots_key(url):
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc.lower()}"
+
+
+def build_parser(status, body):
+    """RobotFileParser for a fetched robots.txt, following urllib's rules for error statuses.
+
+    Unlike urllib, a robots.txt that could not be fetched at all (network error or 5xx)
+    disallows the host. The crawler defers such a host's URLs instead of dropping them,
+    and the short error TTL makes sure the rules are fetched again soon.
+    """
+    parser = RobotFileParser()
+    if status in (401, 403) or status == FETCH_ERROR or status >= 500:
+        parser.disallow_all = True
+    elif status >= 400:
+        parser.allow_all = True
+    else:
+        parser.parse(body.splitlines())
+    return parser
+
+
+class RobotsRules:
+    def __init__(self, status, body, expires_at):
+        self.status = status
+        self.expires_at = expires_at
+        self.parser = build_parser(status, body)
+
+    @property
+    def unavailable(self):
+        """robots.txt could not be fetched (network error or 5xx): the rules are a stand-in"""
+        return self.status == FETCH_ERROR or self.status >= 500
+
+    def expired(self, now=None):
+        return (time.time() if now is None else now) >= self.expires_at
+
+    def can_fetch(self, user_agent, url):
+        return self.parser.can_fetch(user_agent, url)
+
+    def crawl_delay(self, user_agent):
+        return self.parser.crawl_delay(user_agent)
+
+
+class RobotsCache:
+    """robots.txt rules per host, fetched through the crawler's pooled HTTP client.
+
+    Rules are kept for ttl seconds (error_ttl when the fetch failed) and persisted to
+    SQLite, so a new crawl within the TTL does not refetch them. prefetch() starts the
+    fetch on a background thread as soon as a new host shows up in the frontier; only
+    one fetch per host is ever in flight.
+    """
+
+    def __init__(self, http, user_agent, path=None, ttl=86400, error_ttl=30, timeout=5, prefetch_workers=4):
+        self.http = http
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.timeout = timeout
+        self.rules = {}
+        self.fetching = {}   # robots key -> Future of the fetch in progress
+        self.executor = ThreadPoolExecutor(max_workers=prefetch_workers, thread_name_prefix='robots')
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+
+        self.connection = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS robots (
+                    host TEXT PRIMARY KEY,
+                    status INTEGER NOT NULL,
+                    body TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            self.connection.commit()
+
+    def load(self, key):
+        """Unexpired rules for key from the persistent cache, or None"""
+        if self.connection is None:
+            return None
+        with self._lock:
+            row = self.connection.execute('SELECT status, body, expires_at FROM robots WHERE host = ?',
+                                          (key,)).fetchone()
+        if row is None or row[2] <= time.time():
+            return None
+        return RobotsRules(*row)
+
+    def store(self, key, status, body, expires_at):
+        if self.connection is None:
+            return
+        with self._lock:
+            self.connection.execute('INSERT OR REPLACE INTO robots (host, status, body, expires_at) VALUES (?, ?, ?, ?)',
+                                    (key, status, body, expires_at))
+            self.connection.commit()
+
+    def fetch(self, key):
+        try:
+            response = self.http.get(f"{key}/robots.txt", headers={'User-Agent': self.user_agent},
+                                     timeout=self.timeout)
+            status = response.status_code
+            body = response.content[:MAX_ROBOTS_BYTES].decode('utf-8', errors='replace') if status < 400 else ''
+        except Exception as e:
+            self.logger.warning(f"Could not fetch robots.txt for {key}: {str(e)}")
+            status, body = FETCH_ERROR, ''
+
+        rules = RobotsRules(status, body, 0)
+        rules.expires_at = time.time() + (self.error_ttl if rules.unavailable else self.ttl)
+        self.store(key, status, body, rules.expires_at)
+        return rules
+
+    def resolve(self, key):
+        """Rules from the persistent cache, or freshly fetched; runs once per key at a time"""
+        try:
+            rules = self.load(key) or self.fetch(key)
+            with self._lock:
+                self.rules[key] = rules
+            return rules
+        finally:
+            with self._lock:
+                self.fetching.pop(key, None)
+
+    def submit(self, key):
+        """Future for the rules of key, reusing a fetch that is already running"""
+        with self._lock:
+            future = self.fetching.get(key)
+            if future is None:
+                future = self.fetching[key] = self.executor.submit(self.resolve, key)
+            return future
+
+    def cached(self, key):
+        with self._lock:
+            rules = self.rules.get(key)
+        if rules is not None and not rules.expired():
+            return rules
+        return None
+
+    def prefetch(self, url):
+        """Start fetching the rules for url's host in the background unless they are cached"""
+        key = robots_key(url)
+        if self.cached(key) is None:
+            self.submit(key)
+
+    def get(self, url):
+        """Rules for url's host, waiting for the fetch when they are not cached yet"""
+        key = robots_key(url)
+        return self.cached(key) or self.submit(key).result()
+
+    def can_fetch(self, url):
+        return self.get(url).can_fetch(self.user_agent, url)
+
+    def unavailable_rules(self, url):
+        """The stand-in rules of url's host when its robots.txt could not be fetched, or
+        None when the real rules are known; expires_at is when the fetch is retried"""
+        rules = self.get(url)
+        return rules if rules.unavailable else None
+
+    def crawl_delay(self, url):
+        """Crawl-delay of url's host for our user agent, if its cached rules set one"""
+        rules = self.cached(robots_key(url))
+        return rules.crawl_delay(self.user_agent) if rules else None
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        if self.connection is not None:
+            self.connection.close()
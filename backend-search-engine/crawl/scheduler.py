@@ -0,0 +1,81 @@
+import heapq
+import threading
+import time
+from collections import deque
+from urllib.parse import urlparse
+
+
+class HostScheduler:
+    """Per-host queues that hand out at most one URL per host at a time.
+
+    A host becomes ready again crawl_delay seconds after its last fetch finished, so
+    a slow or delayed host never holds up the others.
+    """
+
+    def __init__(self, crawl_delay=1):
+        self.crawl_delay = crawl_delay
+        self.host_queues = {}
+        self.ready_heap = []  # (ready_at, host) for idle hosts with queued URLs
+        self.busy_hosts = set()
+        self.host_delays = {}
+        self.next_ready_at = {}
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc.lower()
+
+    def set_delay(self, host, delay):
+        """Override crawl_delay for one host"""
+        with self._lock:
+            self.host_delays[host] = delay
+
+    def delay_for(self, host):
+        return self.host_delays.get(host, self.crawl_delay)
+
+    def add(self, url):
+        host = self.host_of(url)
+        with self._lock:
+            queue = self.host_queues.get(host)
+            if queue is None:
+                queue = self.host_queues[host] = deque()
+            was_idle = not queue and host not in self.busy_hosts
+            queue.append(url)
+            self.pending += 1
+            if was_idle:
+                heapq.heappush(self.ready_heap, (self.next_ready_at.get(host, 0), host))
+
+    def next_url(self, now=None):
+        """Pop a URL from a host that is ready now, or return None"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self.ready_heap or self.ready_heap[0][0] > now:
+                return None
+            _, host = heapq.heappop(self.ready_heap)
+            url = self.host_queues[host].popleft()
+            self.pending -= 1
+            self.busy_hosts.add(host)
+            return url
+
+    def release(self, url, now=None):
+        """Mark the fetch of url finished; its host is ready again after the host's delay"""
+        host = self.host_of(url)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.busy_hosts.discard(host)
+            ready_at = now + self.delay_for(host)
+            self.next_ready_at[host] = ready_at
+            if self.host_queues.get(host):
+                heapq.heappush(self.ready_heap, (ready_at, host))
+
+    def seconds_until_ready(self, now=None):
+        """Time until the next host can be fetched, or None when nothing is waiting"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self.ready_heap:
+                return None
+            return max(0.0, self.ready_heap[0][0] - now)
+
+    def __len__(self):
+        return self.pending
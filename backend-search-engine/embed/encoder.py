@@ -0,0 +1,148 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Upper bounds (ms) of the per-batch latency histogram buckets
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_worker_model = None
+
+
+def init_worker(model_name, threads):
+    """Load the model once per worker process, limiting torch to its share of the cores"""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    from sentence_transformers import SentenceTransformer
+    _worker_model = SentenceTransformer(model_name, device='cpu')
+
+
+def encode_batch(texts, batch_size):
+    """Run in a worker process: encode one batch; returns (vectors, seconds)"""
+    started = time.perf_counter()
+    vectors = _worker_model.encode(texts, batch_size=batch_size, show_progress_bar=False)
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - started
+
+
+class EncodeStats:
+    """Documents, wall time and a latency histogram of every encoded batch"""
+
+    def __init__(self):
+        self.documents = 0
+        self.batches = 0
+        self.seconds = 0.0
+        self.histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def record_batch(self, seconds):
+        self.batches += 1
+        elapsed_ms = seconds * 1000
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= bound),
+                      len(LATENCY_BUCKETS_MS))
+        self.histogram[bucket] += 1
+
+    def record_call(self, documents, seconds):
+        self.documents += documents
+        self.seconds += seconds
+
+    def docs_per_second(self):
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    def report(self):
+        """Throughput and histogram lines for the log"""
+        lines = [f"Encoded {self.documents} documents in {self.batches} batches: "
+                 f"{self.seconds:.2f}s, {self.docs_per_second():.1f} docs/s"]
+        lower = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS + (None,), self.histogram):
+            label = f"{lower}-{bound}ms" if bound is not None else f">{lower}ms"
+            if count:
+                lines.append(f"  {label:>13}: {count}")
+            lower = bound
+        return lines
+
+
+class BatchEncoder:
+    """CPU-oriented wrapper around SentenceTransformer.encode.
+
+    Texts are sorted by token length and cut into batches holding at most
+    max_batch_tokens padded tokens, so batches of short texts are large and batches of
+    long texts small, and little time goes into padding. With workers > 1 the batches are
+    spread over a process pool, each worker owning a model and an equal share of the cores.
+    """
+
+    def __init__(self, model, model_name=None, max_batch_tokens=8192, max_batch_size=128, workers=1):
+        self.model = model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_seq_length = getattr(model, 'max_seq_length', None) or 512
+        self.workers = workers or os.cpu_count() or 1
+        self.stats = EncodeStats()
+        self.pool = None
+        if self.workers > 1:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                            initargs=(model_name, threads))
+
+    def token_lengths(self, texts):
+        """Token count of each text after truncation; word count when the model has no tokenizer"""
+        tokenizer = getattr(self.model, 'tokenizer', None)
+        if tokenizer is not None:
+            encoded = tokenizer(texts, add_special_tokens=True, truncation=True,
+                                max_length=self.max_seq_length)['input_ids']
+            return [len(ids) for ids in encoded]
+        # Roughly 1.3 word pieces per word, plus [CLS]/[SEP]
+        return [min(self.max_seq_length, int(len(text.split()) * 1.3) + 2) for text in texts]
+
+    def plan_batches(self, texts):
+        """Index lists of texts with similar length; batch size adapts to the longest text"""
+        lengths = self.token_lengths(texts)
+        order = sorted(range(len(texts)), key=lambda i: lengths[i])
+        batches = []
+        batch = []
+        for i in order:
+            # Sorted ascending, so the text being added is the longest in the batch
+            if batch and ((len(batch) + 1) * lengths[i] > self.max_batch_tokens
+                          or len(batch) >= self.max_batch_size):
+                batches.append(batch)
+                batch = []
+            batch.append(i)
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def encode(self, texts):
+        """float32 vectors for texts, in input order"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        started = time.perf_counter()
+        batches = self.plan_batches(texts)
+        results = [None] * len(texts)
+
+        if self.pool is not None:
+            futures = [(batch, self.pool.submit(encode_batch, [texts[i] for i in batch], len(batch)))
+                       for batch in batches]
+            for batch, future in futures:
+                vectors, seconds = future.result()
+                self.stats.record_batch(seconds)
+                for i, vector in zip(batch, vectors):
+                    results[i] = vector
+        else:
+            for batch in batches:
+                batch_started = time.perf_counter()
+                vectors = self.model.encode([texts[i] for i in batch], batch_size=len(batch),
+                                            show_progress_bar=False)
+                self.stats.record_batch(time.perf_counter() - batch_started)
+                for i, vector in zip(batch, vectors):
+                    results[i] = vector
+
+        self.stats.record_call(len(texts), time.perf_counter() - started)
+        return np.asarray(results, dtype=np.float32)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
@@ -1,14 +1,43 @@
+import hashlib
 import json
 import os
+import sys
 from datetime import datetime
 from sentence_transformers import SentenceTransformer
 import logging
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.jsonl_io import JsonlSink, iter_documents, dataset_files, find_latest_dataset
+from common.vector_file import VectorWriter
+from encoder import BatchEncoder
+from vector_store import VectorStore
+
 CRAWLED_DATA = "../data/crawled_data_20250806_122427.json"
 OUTPUT_DIR = "../data/data_with_embeddings"
 
 EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
 
+# Documents read, encoded and written per step; memory stays flat whatever the corpus size
+CHUNK_SIZE = 512
+# Output JSONL rotates to a new part once a part reaches this size
+MAX_PART_BYTES = 100 * 1024 * 1024
+# Batches are sorted by token length and sized to hold at most MAX_BATCH_TOKENS padded tokens
+MAX_BATCH_TOKENS = 8192
+MAX_BATCH_SIZE = 128
+# Encoder processes; 1 encodes in this process, 0 uses one process per core
+ENCODE_WORKERS = 1
+# Vectors already computed, keyed by model and text hash; reused across runs
+VECTOR_STORE = "../data/vector_store.sqlite"
+# Element type of the output vector matrix: float32, float16 or int8
+VECTOR_DTYPE = 'float32'
+# Also embed overlapping passages of each document; MiniLM only sees the first 256 tokens
+# of a text, so long articles are otherwise represented by their opening paragraphs alone.
+# Needs the passage_vector field of indexer/solr_schema.json in the collection schema first
+PASSAGE_EMBEDDINGS = False
+PASSAGE_WORDS = 150
+PASSAGE_OVERLAP = 30
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
@@ -17,9 +46,73 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-def generate_embeddings(input_file_path, output_dir, model_name):
+def document_text(doc):
+    """Text that is embedded for a document: title, headings and body"""
+    sections = []
+
+    # Add title if present
+    if doc.get("title"):
+        sections.append(doc["title"].strip())
+
+    # Add headings if present and non-empty
+    if doc.get("headings"):
+        if isinstance(doc["headings"], list):
+            headings = " ".join(h.strip() for h in doc["headings"] if h.strip())
+            if headings:
+                sections.append(headings)
+        elif isinstance(doc["headings"], str) and doc["headings"].strip():
+            sections.append(doc["headings"].strip())
+
+    # Add body if present
+    if doc.get("body"):
+        sections.append(doc["body"].strip())
+
+    # Join all sections into one string
+    return ' '.join(sections).strip()
+
 
-    if not os.path.exists(input_file_path):
+def split_passages(text, words=PASSAGE_WORDS, overlap=PASSAGE_OVERLAP):
+    """Overlapping windows of words over text; a short text is a single passage"""
+    tokens = text.split()
+    if len(tokens) <= words:
+        return [text] if tokens else []
+    step = max(1, words - overlap)
+    passages = []
+    for start in range(0, len(tokens), step):
+        passages.append(' '.join(tokens[start:start + words]))
+        if start + words >= len(tokens):
+            break
+    return passages
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def iter_chunks(documents, size):
+    chunk = []
+    for doc in documents:
+        chunk.append(doc)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def generate_embeddings(input_file_path, output_dir, model_name, chunk_size=CHUNK_SIZE,
+                        store_path=VECTOR_STORE, vector_dtype=VECTOR_DTYPE, workers=ENCODE_WORKERS,
+                        max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=MAX_BATCH_SIZE,
+                        passages=PASSAGE_EMBEDDINGS, max_part_bytes=MAX_PART_BYTES):
+    """Stream documents from input_file_path in chunks and write them to JSONL parts of at
+    most max_part_bytes in output_dir, with their vectors in a binary matrix next to them (see common.vector_file).
+    Only texts without a stored vector for model_name are encoded, so re-running after an
+    interruption or on an overlapping crawl skips finished work.
+
+    With passages, every document is also split into overlapping passages whose vectors
+    go to a second matrix (<prefix>.passages); the indexer adds them as child documents."""
+
+    if not dataset_files(input_file_path):
         logger.error(f"Input file not found: {input_file_path}")
         return
     
@@ -33,80 +126,104 @@ def generate_embeddings(input_file_path, output_dir, model_name):
     
     logger.info(f"Reading data from {input_file_path}")
 
-    try:
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            documents = json.load(f)
+    encoder = BatchEncoder(model, model_name, max_batch_tokens=max_batch_tokens,
+                           max_batch_size=max_batch_size, workers=workers)
+    store = VectorStore(store_path)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_prefix = os.path.join(output_dir, f"embeddings_{timestamp}")
+    sink = JsonlSink(output_prefix, max_file_bytes=max_part_bytes, buffer_size=chunk_size)
+    vector_writer = VectorWriter(output_prefix, dtype=vector_dtype, model=model_name)
+    passage_writer = VectorWriter(f"{output_prefix}.passages", dtype=vector_dtype, model=model_name) if passages else None
 
-        logger.info(f"Loaded {len(documents)} Documents")
+    skipped_unchanged = 0
+    skipped_empty = 0
+    encoded = 0
+    reused = 0
+
+    try:
+        # Accepts the legacy JSON array as well as the crawler's streamed JSONL(.gz) parts
+        for chunk in iter_chunks(iter_documents(input_file_path), chunk_size):
+            pending = []
+            for doc in chunk:
+                # Incremental crawls mark pages whose content did not change; their vectors are already indexed
+                if doc.get('unchanged'):
+                    skipped_unchanged += 1
+                    continue
+
+                combined_text = document_text(doc)
+                if combined_text:
+                    passage_texts = split_passages(combined_text) if passages else []
+                    pending.append((doc, combined_text, passage_texts))
+                else:
+                    skipped_empty += 1
+                    logger.warning(f"Skipping document {doc.get('id', doc.get('url', 'unknown'))} due to empty text content.")
+
+            # Document and passage texts, by hash; the same text is only encoded once
+            texts = {}
+            for _, combined_text, passage_texts in pending:
+                for text in [combined_text] + passage_texts:
+                    texts.setdefault(text_hash(text), text)
+
+            vectors = store.get_many(model_name, list(texts))
+            missing = {h: text for h, text in texts.items() if h not in vectors}
+            reused += len(texts) - len(missing)
+
+            if missing:
+                try:
+                    new_vectors = encoder.encode(list(missing.values()))
+                except Exception as e:
+                    logger.error(f"Error generating embedding: {e}")
+                    return
+                # Committed before the documents are written, so a resumed run never encodes them again
+                store.put_many(model_name, zip(missing.keys(), new_vectors))
+                vectors.update(zip(missing.keys(), new_vectors))
+                encoded += len(missing)
+
+            for doc, combined_text, passage_texts in pending:
+                # Documents only carry their row; the vector itself goes to the binary matrix
+                doc['vector_row'] = vector_writer.append(doc.get('id'), vectors[text_hash(combined_text)])
+                if passage_writer is not None:
+                    doc['passage_rows'] = [
+                        passage_writer.append(f"{doc.get('id')}-p{n}", vectors[text_hash(text)])
+                        for n, text in enumerate(passage_texts)
+                    ]
+                sink.write(doc)
+
+            logger.info(f"Processed {sink.count} documents ({encoded} texts encoded, {reused} reused, "
+                        f"{encoder.stats.docs_per_second():.1f} docs/s)")
 
     except json.JSONDecodeError as e:
         logger.error(f"Error Decoding JSON from {input_file_path}")
+        return
 
     except Exception as e:
         logger.error(f"Error reading file {input_file_path}: {e}")
         return
-    
-    texts_to_embed = []
-    processed_documents = []
 
-    for doc in documents:
-        sections = []
-
-        # Add title if present
-        if doc.get("title"):
-            sections.append(doc["title"].strip())
-
-        # Add headings if present and non-empty
-        if doc.get("headings"):
-            if isinstance(doc["headings"], list):
-                headings = " ".join(h.strip() for h in doc["headings"] if h.strip())
-                if headings:
-                    sections.append(headings)
-            elif isinstance(doc["headings"], str) and doc["headings"].strip():
-                sections.append(doc["headings"].strip())
-
-        # Add body if present
-        if doc.get("body"):
-            sections.append(doc["body"].strip())
-
-        # Join all sections into one string
-        combined_text = ' '.join(sections).strip()
-
-        if combined_text:
-            texts_to_embed.append(combined_text)
-            processed_documents.append(doc)
-        else:
-            logger.warning(f"Skipping document {doc.get('id', doc.get('url', 'unknown'))} due to empty text content.")
-
-    if not texts_to_embed:
-       logger.warning("No valid text content found to generate embeddings for.")
-       return 
-    
-    logger.info(f"Generating embeddings for {len(texts_to_embed)} documents...")
-
-    try:
-        embeddings = model.encode(texts_to_embed, batch_size= 32, show_progress_bar=True)
-        logger.info("Embeddings generated successfully")
-    except Exception as e:
-        logger.error(f"Error generating embedding: {e}") 
+    finally:
+        sink.close()
+        vector_writer.close()
+        if passage_writer is not None:
+            passage_writer.close()
+        store.close()
+        encoder.close()
+        for line in encoder.stats.report():
+            logger.info(line)
+
+    if skipped_unchanged:
+        logger.info(f"Skipped {skipped_unchanged} unchanged documents")
+    if skipped_empty:
+        logger.info(f"Skipped {skipped_empty} documents without text")
+
+    if not sink.count:
+        logger.warning("No valid text content found to generate embeddings for.")
         return
-    
-    
-    for i, embeddings in enumerate(embeddings):
-        processed_documents[i]['embedding_vector'] = embeddings.tolist()
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    output_file_name = f"embeddings_{timestamp}.json"
-    output_file_path = os.path.join(output_dir, output_file_name)
-
-    logger.info(f"Saving processed data with embeddings to {output_file_path}...")
-    try:
-        with open(output_file_path, 'w', encoding='utf-8') as f:
-            json.dump(processed_documents, f, indent=2, ensure_ascii=False)
-        logger.info(f"Successfully saved {len(processed_documents)} documents with embeddings.")
-    except Exception as e:
-        logger.error(f"Error saving output file {output_file_path}: {e}")
+    logger.info(f"Successfully saved {sink.count} documents to {', '.join(sink.files)} with {vector_dtype} "
+                f"vectors in {vector_writer.matrix_path} ({encoded} encoded, {reused} reused from {store_path})")
+    return sink.files
 
 
 if __name__ == "__main__":
-    generate_embeddings(CRAWLED_DATA, OUTPUT_DIR, EMBEDDING_MODEL)
+    input_path = find_latest_dataset('../data', 'crawled_data_') or CRAWLED_DATA
+    generate_embeddings(input_path, OUTPUT_DIR, EMBEDDING_MODEL)
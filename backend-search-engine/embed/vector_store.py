@@ -0,0 +1,59 @@
+import os
+import sqlite3
+
+import numpy as np
+
+
+class VectorStore:
+    """Embedding vectors already computed, keyed by model and the hash of the embedded text.
+
+    Vectors are stored as raw float32 bytes in SQLite. A document whose text hash is
+    present for the same model never has to be encoded again, which makes embedding
+    runs incremental and lets an interrupted run resume where it stopped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS vectors (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+        ''')
+        self.connection.commit()
+
+    def get_many(self, model, text_hashes):
+        """{text_hash: float32 vector} for the hashes that have a stored vector"""
+        found = {}
+        hashes = list(set(text_hashes))
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self.connection.execute(
+                f'SELECT text_hash, vector FROM vectors WHERE model = ? AND text_hash IN ({placeholders})',
+                [model] + chunk)
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        """Store (text_hash, vector) pairs; committed together so a crash never leaves half a batch"""
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO vectors (model, text_hash, vector) VALUES (?, ?, ?)',
+            [(model, text_hash, np.asarray(vector, dtype=np.float32).tobytes()) for text_hash, vector in items])
+        self.connection.commit()
+
+    def count(self, model):
+        return self.connection.execute('SELECT COUNT(*) FROM vectors WHERE model = ?', (model,)).fetchone()[0]
+
+    def close(self):
+        self.connection.close()
@@ -0,0 +1,49 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+
+class DeadLetterFile:
+    """JSONL file of the Solr documents that could not be indexed, with the last error.
+
+    The file is only created when the first document fails. Each line holds the prepared
+    Solr document unchanged, so SolrCloudIndexer.replay_dead_letters can send it again.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = None
+        self.file = None
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def write(self, document_json, error):
+        """Record one serialized Solr document (bytes) that still failed after all retries"""
+        record = (b'{"error": ' + json.dumps(str(error)).encode('utf-8')
+                  + b', "failed_at": "' + datetime.now().isoformat().encode('ascii')
+                  + b'", "document": ' + document_json + b'}\n')
+        with self._lock:
+            if self.file is None:
+                os.makedirs(self.directory, exist_ok=True)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                self.path = os.path.join(self.directory, f"dead_letter_{timestamp}.jsonl")
+                self.file = open(self.path, 'ab')
+            self.file.write(record)
+            self.file.flush()
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+def iter_dead_letters(path):
+    """Solr documents recorded in a dead-letter file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)['document']
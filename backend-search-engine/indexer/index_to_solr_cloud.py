@@ -1,15 +1,105 @@
 import json
-import requests
 import logging
 from datetime import datetime
 import os
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.config import load_config
+from common.http_transport import get_transport
+from common.index_generation import IndexGeneration
+from common.jsonl_io import iter_documents, find_latest_dataset
+from common.node_health import NodeHealthTracker
+from common.solr_schema import PARENT_FILTER
+from common.url_state import UrlStateStore
+from common.vector_file import VectorFile
+from dead_letter import DeadLetterFile, iter_dead_letters
+
+def is_node_error(error):
+    """Errors that say more about the node than the documents: worth retrying elsewhere"""
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(error, 'response', None)
+    return response is not None and response.status_code >= 500
+
+
+def iter_batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def batch_body(parts):
+    """JSON array request body from serialized documents"""
+    return b'[' + b','.join(parts) + b']'
+
+
+class IndexSummary:
+    """Counts of one indexing run, safe to update from the bulk indexer's threads"""
+
+    def __init__(self):
+        self.indexed = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, indexed=0, failed=0, retried=0, batches=0):
+        with self._lock:
+            self.indexed += indexed
+            self.failed += failed
+            self.retried += retried
+            self.batches += batches
+
+    def as_dict(self, committed, dead_letter_file=None):
+        elapsed = time.perf_counter() - self.started
+        return {
+            'indexed': self.indexed,
+            'failed': self.failed,
+            'retried': self.retried,
+            'batches': self.batches,
+            'committed': committed,
+            'dead_letter_file': dead_letter_file,
+            'elapsed_seconds': round(elapsed, 3),
+            'docs_per_second': round(self.indexed / elapsed, 1) if elapsed else 0.0
+        }
+
 
 class SolrCloudIndexer:
     def __init__(self, solr_urls=['http://localhost:8984/solr/search_collection',
                                   'http://localhost:7574/solr/search_collection',
                                   'http://localhost:8985/solr/search_collection']):
         self.solr_urls = solr_urls
+        self.http = get_transport('solr')
+        self.node_health = NodeHealthTracker(solr_urls)
+        config = load_config()
+        solr_config = config.get('solr', {})
+        self.node_health.configure(solr_config.get('node_health', {}))
+        self.bulk_config = solr_config.get('bulk', {})
+        self.retry_config = solr_config.get('retry', {})
+        self.dead_letter_dir = solr_config.get('dead_letter_dir', '../data/dead_letter')
+        # Bumped after every commit so query servers drop cached results of the old index
+        self.index_generation = IndexGeneration(
+            solr_config.get('index_generation_path', '../data/index_generation.json'))
+        # The crawler's incremental state; pages are only skipped by later crawls once a
+        # commit here has confirmed their content
+        incremental_config = config.get('incremental', {})
+        state_path = incremental_config.get('state_path', '../data/url_state.sqlite')
+        self.url_state = None
+        if incremental_config.get('enabled', False) and os.path.exists(state_path):
+            self.url_state = UrlStateStore(state_path)
         self.setup_logging()
     
     def setup_logging(self):
@@ -24,21 +114,12 @@ class SolrCloudIndexer:
         self.logger = logging.getLogger(__name__)
     
     def get_active_solr_url(self):
-        """Get an active Solr URL for indexing"""
-        for url in self.solr_urls:
-            try:
-                response = requests.get(f"{url}/admin/ping", timeout=5)
-                if response.status_code == 200:
-                    return url
-            except:
-                continue
-        
-        # If no URLs work, return the first one and let it fail
-        self.logger.warning("No active Solr nodes found, using first URL")
-        return self.solr_urls[0]
+        """Get an active Solr URL for indexing from the cached node health"""
+        return self.node_health.get_url()
     
-    def prepare_document(self, doc):
-        """Prepare document for Solr indexing"""
+    def prepare_document(self, doc, vectors=None, passage_vectors=None):
+        """Prepare document for Solr indexing; vectors and passage_vectors are the dataset's
+        document and passage VectorFiles, if it has them"""
         from urllib.parse import urlparse
         
         parsed_url = urlparse(doc['url'])
@@ -60,69 +141,262 @@ class SolrCloudIndexer:
         # Add embedding vector if present
         if 'embedding_vector' in doc:
             solr_doc['embedding_vector'] = doc['embedding_vector']
+        elif vectors is not None and doc.get('vector_row') is not None:
+            # Read straight from the memory-mapped matrix; only this row is touched
+            solr_doc['embedding_vector'] = vectors.vector(doc['vector_row']).tolist()
+
+        # Passage vectors become nested child documents, matched by passage semantic search
+        if passage_vectors is not None and doc.get('passage_rows'):
+            solr_doc['passages'] = [
+                {
+                    'id': f"{doc['id']}-p{n}",
+                    'passage_index': n,
+                    'passage_vector': passage_vectors.vector(row).tolist()
+                }
+                for n, row in enumerate(doc['passage_rows'])
+            ]
         
         return solr_doc
     
-    def index_documents(self, documents, batch_size=100):
-        """Index documents to SolrCloud with batching"""
-        if not documents:
-            self.logger.warning("No documents to index")
-            return False
-        
+    def serialize_document(self, doc, vectors=None, passage_vectors=None):
+        return json.dumps(self.prepare_document(doc, vectors, passage_vectors), ensure_ascii=False).encode('utf-8')
+
+    def send_batch(self, body, commit_within=None):
+        """POST one serialized batch to the next healthy node"""
         solr_url = self.get_active_solr_url()
-        total_docs = len(documents)
-        indexed_count = 0
+        params = {'commitWithin': commit_within} if commit_within else None
+        try:
+            response = self.http.post(
+                f"{solr_url}/update",
+                params=params,
+                data=body,
+                headers={'Content-Type': 'application/json'},
+                timeout=60
+            )
+            response.raise_for_status()
+        except Exception as e:
+            # A rejected document says nothing about the node's health
+            if is_node_error(e):
+                self.node_health.mark_failure(solr_url, e)
+            raise
+
+    def deliver(self, parts, summary, dead_letter, commit_within=None):
+        """Send serialized documents, retrying node errors with exponential backoff (each
+        attempt goes to the next healthy node). A batch Solr rejects is split in half until
+        the offending documents are isolated; those, and batches that exhaust their retries,
+        go to the dead-letter file. Returns True when every document was indexed."""
+        max_retries = self.retry_config.get('max_retries', 3)
+        backoff = self.retry_config.get('backoff_seconds', 0.5)
+        max_backoff = self.retry_config.get('max_backoff_seconds', 8)
+        body = batch_body(parts)
+        error = None
+
+        for attempt in range(max_retries + 1):
+            if attempt:
+                summary.add(retried=1)
+                time.sleep(min(backoff * 2 ** (attempt - 1), max_backoff))
+            try:
+                self.send_batch(body, commit_within)
+                summary.add(indexed=len(parts))
+                return True
+            except Exception as e:
+                error = e
+                if not is_node_error(e):
+                    break
+
+        if not is_node_error(error) and len(parts) > 1:
+            self.logger.warning(f"Batch of {len(parts)} documents rejected, splitting it: {str(error)}")
+            middle = len(parts) // 2
+            first = self.deliver(parts[:middle], summary, dead_letter, commit_within)
+            second = self.deliver(parts[middle:], summary, dead_letter, commit_within)
+            return first and second
+
+        self.logger.error(f"Giving up on {len(parts)} documents: {str(error)}")
+        for part in parts:
+            dead_letter.write(part, error)
+        summary.add(failed=len(parts))
+        return False
+
+    def index_documents(self, documents, batch_size=100, vectors=None, passage_vectors=None):
+        """Index documents to SolrCloud with batching; returns an IndexSummary dict.
+        documents may be any iterable; only one batch is held in memory at a time"""
+        documents = self.fresh_documents(documents)
+        summary = IndexSummary()
+        dead_letter = DeadLetterFile(self.dead_letter_dir)
         
         # Process in batches
-        for i in range(0, total_docs, batch_size):
-            batch = documents[i:i + batch_size]
-            solr_docs = [self.prepare_document(doc) for doc in batch]
+        for batch in iter_batches(documents, batch_size):
+            parts = [self.serialize_document(doc, vectors, passage_vectors) for doc in batch]
+            summary.add(batches=1)
             
-            try:
-                # Add documents to Solr
-                response = requests.post(
-                    f"{solr_url}/update/json/docs",
-                    json=solr_docs,
-                    headers={'Content-Type': 'application/json'},
-                    timeout=30
-                )
-                response.raise_for_status()
-                
-                indexed_count += len(solr_docs)
-                self.logger.info(f"Indexed batch {i//batch_size + 1}: {len(solr_docs)} documents ({indexed_count}/{total_docs})")
-                
-                # Small delay between batches
-                time.sleep(0.1)
-                
-            except Exception as e:
-                self.logger.error(f"Error indexing batch {i//batch_size + 1}: {str(e)}")
-                # Try with a different Solr node
-                solr_url = self.get_active_solr_url()
-                continue
+            if self.deliver(parts, summary, dead_letter):
+                self.logger.info(f"Indexed batch {summary.batches}: {len(parts)} documents ({summary.indexed} so far)")
+            
+            # Small delay between batches
+            time.sleep(0.1)
+        dead_letter.close()
+
+        if not summary.batches:
+            self.logger.warning("No documents to index")
+            return summary.as_dict(committed=False)
         
         # Commit changes
+        solr_url = self.get_active_solr_url()
+        committed = False
         try:
-            commit_response = requests.post(
+            commit_response = self.http.post(
                 f"{solr_url}/update",
                 json={'commit': {}},
                 headers={'Content-Type': 'application/json'},
                 timeout=30
             )
             commit_response.raise_for_status()
+            committed = True
+            self.index_generation.bump()
             
-            self.logger.info(f"Successfully indexed and committed {indexed_count} documents")
-            return True
+            self.logger.info(f"Successfully indexed and committed {summary.indexed} documents")
             
         except Exception as e:
             self.logger.error(f"Error committing documents: {str(e)}")
+
+        return self.finish(summary, committed, dead_letter)
+
+    def fresh_documents(self, documents, flush_every=500):
+        """Documents to send, without the pages an incremental crawl found unchanged (they
+        are already in the index); the content hash of each is recorded as pending"""
+        pending = []
+        for doc in documents:
+            if doc.get('unchanged'):
+                continue
+            if self.url_state is not None and doc.get('content_hash'):
+                pending.append((doc['url'], doc['content_hash']))
+                if len(pending) >= flush_every:
+                    self.url_state.mark_pending(pending)
+                    pending = []
+            yield doc
+        if pending and self.url_state is not None:
+            self.url_state.mark_pending(pending)
+
+    def confirm_indexed(self, committed, dead_letter):
+        """Promote the pending content hashes of this run to indexed, except those of
+        dead-lettered documents; without a commit nothing is confirmed"""
+        if self.url_state is None:
+            return
+        if not committed:
+            self.url_state.clear_pending()
+            return
+        if dead_letter.path:
+            self.url_state.discard_pending(doc.get('url') for doc in iter_dead_letters(dead_letter.path))
+        confirmed = self.url_state.confirm_pending()
+        self.logger.info(f"Confirmed {confirmed} indexed pages in the incremental crawl state")
+
+    def finish(self, summary, committed, dead_letter):
+        self.confirm_indexed(committed, dead_letter)
+        result = summary.as_dict(committed, dead_letter.path)
+        if summary.failed:
+            self.logger.error(f"{summary.failed} documents failed; replay them from {dead_letter.path}")
+        self.logger.info(f"Indexing summary: {json.dumps(result)}")
+        return result
+
+    def pack_batches(self, parts, max_batch_bytes):
+        """Group serialized documents into lists whose JSON array is at most max_batch_bytes
+        (a single larger document still gets its own batch)"""
+        batch = []
+        size = 2
+        for part in parts:
+            if batch and size + len(part) + 1 > max_batch_bytes:
+                yield batch
+                batch = []
+                size = 2
+            batch.append(part)
+            size += len(part) + 1
+        if batch:
+            yield batch
+
+    def iter_byte_batches(self, documents, vectors=None, passage_vectors=None, max_batch_bytes=5 * 1024 * 1024):
+        """Serialized documents in batches of at most max_batch_bytes"""
+        parts = (self.serialize_document(doc, vectors, passage_vectors)
+                 for doc in self.fresh_documents(documents))
+        return self.pack_batches(parts, max_batch_bytes)
+
+    def soft_commit(self):
+        """Open a new searcher on the indexed documents without flushing segments to disk"""
+        solr_url = self.get_active_solr_url()
+        try:
+            response = self.http.post(
+                f"{solr_url}/update",
+                params={'softCommit': 'true', 'waitSearcher': 'false'},
+                json={'commit': {}},
+                headers={'Content-Type': 'application/json'},
+                timeout=30
+            )
+            response.raise_for_status()
+            self.index_generation.bump()
+            return True
+        except Exception as e:
+            self.logger.error(f"Error soft-committing documents: {str(e)}")
             return False
-    
+
+    def deliver_concurrently(self, batches, max_in_flight=None, commit_within=None):
+        """Send batches of serialized documents on a thread pool with at most max_in_flight
+        outstanding, then soft-commit; returns an IndexSummary dict"""
+        max_in_flight = max_in_flight or self.bulk_config.get('max_in_flight_per_node', 2) * len(self.solr_urls)
+        commit_within = commit_within or self.bulk_config.get('commit_within_ms', 10000)
+        summary = IndexSummary()
+        dead_letter = DeadLetterFile(self.dead_letter_dir)
+        in_flight = {}
+
+        def collect(done):
+            for future in done:
+                number, count = in_flight.pop(future)
+                if future.result():
+                    self.logger.info(f"Indexed batch {number}: {count} documents ({summary.indexed} so far)")
+
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            for parts in batches:
+                if len(in_flight) >= max_in_flight:
+                    done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    collect(done)
+                summary.add(batches=1)
+                future = pool.submit(self.deliver, parts, summary, dead_letter, commit_within)
+                in_flight[future] = (summary.batches, len(parts))
+            collect(wait(list(in_flight)).done)
+        dead_letter.close()
+
+        if not summary.batches:
+            self.logger.warning("No documents to index")
+            return summary.as_dict(committed=False)
+
+        self.logger.info(f"Bulk indexed {summary.indexed} documents in {summary.batches} batches, "
+                         f"{summary.failed} failed, {summary.retried} retries")
+        committed = self.soft_commit() if summary.indexed else False
+        return self.finish(summary, committed, dead_letter)
+
+    def bulk_index(self, documents, vectors=None, passage_vectors=None, max_batch_bytes=None,
+                   max_in_flight=None, commit_within=None):
+        """Index documents with batches sized by bytes, sent concurrently to all healthy nodes.
+
+        At most max_in_flight batches are outstanding (default: max_in_flight_per_node for
+        every node), so memory stays bounded however many documents stream in. Nothing
+        blocks on a hard commit: documents become visible through commitWithin and a final
+        soft commit, and Solr's autoCommit makes them durable.
+        """
+        max_batch_bytes = max_batch_bytes or self.bulk_config.get('max_batch_bytes', 5 * 1024 * 1024)
+        batches = self.iter_byte_batches(documents, vectors, passage_vectors, max_batch_bytes)
+        return self.deliver_concurrently(batches, max_in_flight, commit_within)
+
+    def replay_dead_letters(self, path):
+        """Send the documents of a dead-letter file again; those that still fail go to a new one"""
+        parts = (json.dumps(doc, ensure_ascii=False).encode('utf-8') for doc in iter_dead_letters(path))
+        max_batch_bytes = self.bulk_config.get('max_batch_bytes', 5 * 1024 * 1024)
+        return self.deliver_concurrently(self.pack_batches(parts, max_batch_bytes))
+
     def delete_all_documents(self):
         """Delete all documents from SolrCloud collection"""
         solr_url = self.get_active_solr_url()
         
         try:
-            response = requests.post(
+            response = self.http.post(
                 f"{solr_url}/update",
                 json={'delete': {'query': '*:*'}},
                 headers={'Content-Type': 'application/json'},
@@ -131,13 +405,14 @@ class SolrCloudIndexer:
             response.raise_for_status()
             
             # Commit changes
-            commit_response = requests.post(
+            commit_response = self.http.post(
                 f"{solr_url}/update",
                 json={'commit': {}},
                 headers={'Content-Type': 'application/json'},
                 timeout=30
             )
             commit_response.raise_for_status()
+            self.index_generation.bump()
             
             self.logger.info("Successfully deleted all documents")
             return True
@@ -149,12 +424,15 @@ class SolrCloudIndexer:
     def get_collection_status(self):
         """Get collection status across all nodes"""
         status = {}
+        self.node_health.check_all()
+        node_status = self.node_health.cluster_status()
         for i, url in enumerate(self.solr_urls):
             try:
-                response = requests.get(f"{url}/admin/ping", timeout=5)
-                if response.status_code == 200:
+                if node_status[f"node_{i+1}"]["status"] == "active":
                     # Get document count
-                    count_response = requests.get(f"{url}/select?q=*:*&rows=0&wt=json", timeout=5)
+                    # Root documents only; passages are nested children of them
+                    count_response = self.http.get(f"{url}/select", params={
+                        'q': '*:*', 'fq': PARENT_FILTER, 'rows': 0, 'wt': 'json'}, timeout=5)
                     doc_count = count_response.json().get('response', {}).get('numFound', 0)
                     
                     status[f"node_{i+1}"] = {
@@ -176,20 +454,36 @@ class SolrCloudIndexer:
         return status
     
     def index_from_file(self, json_file):
-        """Index documents from JSON file"""
+        """Index documents from a JSON array, JSONL(.gz) file or rotated JSONL dataset.
+        Documents are read lazily as batches are sent, so memory stays flat for any file size.
+        Always returns an IndexSummary dict; one with an 'error' key when the file could not be read"""
         try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                documents = json.load(f)
+            documents = iter_documents(json_file)
+            # Vectors written by the embed stage as a binary matrix next to the dataset
+            vectors = VectorFile.for_dataset(json_file)
+            passage_vectors = VectorFile.for_dataset(f"{json_file}.passages")
             
-            self.logger.info(f"Loading {len(documents)} documents from {json_file}")
-            return self.index_documents(documents)
+            self.logger.info(f"Streaming documents from {json_file}")
+            if self.bulk_config.get('enabled', False):
+                return self.bulk_index(documents, vectors=vectors, passage_vectors=passage_vectors)
+            return self.index_documents(documents, vectors=vectors, passage_vectors=passage_vectors)
             
         except Exception as e:
             self.logger.error(f"Error reading file {json_file}: {str(e)}")
-            return False
+            if self.url_state is not None:
+                # Nothing sent by this run is confirmed
+                self.url_state.clear_pending()
+            result = IndexSummary().as_dict(committed=False)
+            result['error'] = str(e)
+            return result
 
 if __name__ == "__main__":
     indexer = SolrCloudIndexer()
+
+    # python index_to_solr_cloud.py --replay <dead_letter file>
+    if len(sys.argv) > 2 and sys.argv[1] == '--replay':
+        print(json.dumps(indexer.replay_dead_letters(sys.argv[2]), indent=2))
+        sys.exit(0)
     
     # Show collection status
     print("SolrCloud Collection Status:")
@@ -200,12 +494,11 @@ if __name__ == "__main__":
     data_dir = '../data/data_with_embeddings'
 
     if os.path.exists(data_dir):
-        json_files = [f for f in os.listdir(data_dir) if f.endswith('.json')]
-        if json_files:
-            latest_file = max(json_files)
-            file_path = os.path.join(data_dir, latest_file)
+        # Newest .json, .jsonl(.gz) file or rotated JSONL dataset
+        file_path = find_latest_dataset(data_dir)
+        if file_path:
             print(f"\nIndexing from: {file_path}")
-            indexer.index_from_file(file_path)
+            print(json.dumps(indexer.index_from_file(file_path), indent=2))
         else:
             print("No JSON files found in data directory")
     else:
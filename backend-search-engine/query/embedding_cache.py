@@ -0,0 +1,208 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from embedding_provider import EmbeddingProvider
+
+
+def normalize_query(text):
+    """Case and whitespace insensitive form of a query used as the cache key"""
+    return ' '.join(str(text).lower().split())
+
+
+def key_fingerprint(key):
+    """Non-zero 64-bit hash of a cache key, stored next to its row so stale index entries are caught"""
+    digest = hashlib.blake2b('\x00'.join(key).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') or 1
+
+
+class EmbeddingCache:
+    """Bounded LRU cache of query embeddings stored as rows of one float32 matrix.
+
+    With cache_dir set the matrix is a numpy memmap and the key index is kept in a
+    JSON sidecar, so a restarted process starts with the previous contents. Each row's
+    key fingerprint is memmapped alongside it; load() drops sidecar entries whose row
+    was reused for another query after the sidecar was last written.
+    """
+
+    def __init__(self, capacity=1024, cache_dir=None, name='query_embeddings', flush_every=64):
+        self.capacity = capacity
+        self.cache_dir = cache_dir
+        self.name = name
+        self.flush_every = flush_every
+        self.pending_writes = 0
+        self.logger = logging.getLogger(__name__)
+
+        self.slots = OrderedDict()  # (model_name, normalized text) -> row in self.vectors
+        self.free_slots = []
+        self.vectors = None
+        self.fingerprints = None
+        self.dimension = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if cache_dir:
+            self.load()
+
+    @property
+    def matrix_path(self):
+        return os.path.join(self.cache_dir, f"{self.name}.f32")
+
+    @property
+    def fingerprint_path(self):
+        return os.path.join(self.cache_dir, f"{self.name}.keys")
+
+    @property
+    def index_path(self):
+        return os.path.join(self.cache_dir, f"{self.name}.index.json")
+
+    def allocate(self, dimension, existing=False):
+        import numpy as np
+
+        self.dimension = dimension
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            mode = 'r+' if existing else 'w+'
+            self.vectors = np.memmap(self.matrix_path, dtype=np.float32, mode=mode,
+                                     shape=(self.capacity, dimension))
+            self.fingerprints = np.memmap(self.fingerprint_path, dtype=np.uint64, mode=mode,
+                                          shape=(self.capacity,))
+        else:
+            self.vectors = np.zeros((self.capacity, dimension), dtype=np.float32)
+            self.fingerprints = np.zeros(self.capacity, dtype=np.uint64)
+        self.free_slots = list(range(self.capacity - 1, -1, -1))
+
+    def load(self):
+        """Restore the key index and memory-map the matrix left by a previous process"""
+        if not all(os.path.exists(path) for path in (self.index_path, self.matrix_path, self.fingerprint_path)):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get('capacity') != self.capacity:
+                self.logger.warning(f"Embedding cache capacity changed, discarding {self.index_path}")
+                return
+            self.allocate(index['dimension'], existing=True)
+            stale = 0
+            for model_name, text, slot in index['entries']:
+                key = (model_name, text)
+                if int(self.fingerprints[slot]) != key_fingerprint(key):
+                    stale += 1
+                    continue
+                self.slots[key] = slot
+            if stale:
+                self.logger.warning(f"Dropped {stale} cached query embeddings whose rows were reused")
+            used = set(self.slots.values())
+            self.free_slots = [slot for slot in self.free_slots if slot not in used]
+            self.logger.info(f"Loaded {len(self.slots)} cached query embeddings from {self.cache_dir}")
+        except Exception as e:
+            self.logger.error(f"Error loading embedding cache from {self.cache_dir}: {str(e)}")
+            self.slots.clear()
+            self.vectors = None
+            self.fingerprints = None
+            self.dimension = None
+
+    def flush(self):
+        """Write the key index and sync the memmap; a no-op for in-memory caches"""
+        if not self.cache_dir or self.vectors is None:
+            return
+        with self._lock:
+            self.vectors.flush()
+            self.fingerprints.flush()
+            index = {
+                'capacity': self.capacity,
+                'dimension': self.dimension,
+                'entries': [[model_name, text, slot] for (model_name, text), slot in self.slots.items()]
+            }
+            tmp_path = self.index_path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, self.index_path)
+            self.pending_writes = 0
+
+    def get(self, text, model_name):
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            slot = self.slots.get(key)
+            if slot is None:
+                self.misses += 1
+                return None
+            self.slots.move_to_end(key)
+            self.hits += 1
+            return self.vectors[slot].copy()
+
+    def put(self, text, model_name, vector):
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            if self.vectors is None:
+                self.allocate(len(vector))
+            if len(vector) != self.dimension:
+                # A model with a different width cannot share the matrix
+                return
+            slot = self.slots.get(key)
+            if slot is None:
+                if self.free_slots:
+                    slot = self.free_slots.pop()
+                else:
+                    _, slot = self.slots.popitem(last=False)
+                self.slots[key] = slot
+            else:
+                self.slots.move_to_end(key)
+            # Clear the fingerprint first so a torn write never matches an old index entry
+            self.fingerprints[slot] = 0
+            self.vectors[slot] = vector
+            self.fingerprints[slot] = key_fingerprint(key)
+            self.pending_writes += 1
+            should_flush = self.cache_dir and self.pending_writes >= self.flush_every
+
+        # Persist the index periodically so a crash loses at most flush_every entries
+        if should_flush:
+            self.flush()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.slots),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'persistent': bool(self.cache_dir)
+        }
+
+
+class CachingEmbeddingProvider(EmbeddingProvider):
+    """Wraps another provider and answers repeated queries from an EmbeddingCache"""
+
+    def __init__(self, provider, cache=None):
+        self.provider = provider
+        self.cache = cache if cache is not None else EmbeddingCache()
+
+    @property
+    def model_name(self):
+        return self.provider.model_name
+
+    @property
+    def model(self):
+        return self.provider.model
+
+    @property
+    def is_loaded(self):
+        return self.provider.is_loaded
+
+    def encode(self, text):
+        vector = self.cache.get(text, self.model_name)
+        if vector is None:
+            vector = self.provider.encode(text)
+            self.cache.put(text, self.model_name, vector)
+        return vector
+
+
+def cache_name_for_model(model_name):
+    """File-system safe cache name so different models never share a matrix"""
+    return 'query_embeddings_' + re.sub(r'[^A-Za-z0-9_.-]+', '_', model_name)
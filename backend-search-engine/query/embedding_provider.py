@@ -0,0 +1,45 @@
+import threading
+
+DEFAULT_EMBEDDING_MODEL = 'all-MiniLM-L6-v2'
+
+
+class EmbeddingProvider:
+    """Minimal interface the query engine needs from a text encoder"""
+
+    model_name = None
+    model = None
+
+    def encode(self, text):
+        """Return the embedding of text as a float32 numpy vector"""
+        raise NotImplementedError
+
+    @property
+    def is_loaded(self):
+        return True
+
+
+class SentenceTransformerProvider(EmbeddingProvider):
+    """Loads the SentenceTransformer model (and torch) on the first encode call"""
+
+    def __init__(self, model_name=DEFAULT_EMBEDDING_MODEL, device=None):
+        self.model_name = model_name
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    # Deferred so keyword search and autocomplete never import torch
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def encode(self, text):
+        return self.model.encode(text)
@@ -0,0 +1,176 @@
+import heapq
+import logging
+import threading
+import time
+from bisect import bisect_left
+
+from embedding_cache import normalize_query
+
+# Prefixes matching more titles than this have their top suggestions memoized
+MEMO_MIN_MATCHES = 256
+# Memoized prefixes kept before the memo starts over
+MEMO_CAPACITY = 4096
+
+
+class PrefixIndex:
+    """Autocomplete suggestions from a sorted array of normalized titles searched by bisection.
+
+    Each entry carries a weight: the number of documents with that title plus the number
+    of searches record() has counted for it, which carry over into every rebuild.
+    load(since) yields (title, last_modified) pairs, all of them when since is None;
+    once start()ed, a daemon thread adds titles indexed since the last refresh whenever
+    the index generation changes, and rebuilds from scratch every rebuild_interval
+    seconds so deletions drop out.
+    """
+
+    def __init__(self, load, generation=None, refresh_interval=10, rebuild_interval=3600):
+        self.load = load
+        self.generation = generation
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.logger = logging.getLogger(__name__)
+
+        # keys (sorted, normalized), display terms and weights; swapped as one tuple
+        self.entries = ([], [], [])
+        self.memo = {}
+        # normalized title -> searches counted by record(); folded into weights on rebuild
+        self.searches = {}
+        self.ready = False
+        self.since = None
+        self.built_at = 0
+        self.refreshed_generation = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self.entries[0])
+
+    def lookup(self, prefix, limit=5):
+        """Up to limit suggestions starting with prefix, heaviest first; [] on a miss"""
+        key = normalize_query(prefix)
+        if not key:
+            return []
+        suggestions = self.memo.get((key, limit))
+        if suggestions is None:
+            keys, terms, weights = self.entries
+            lo = bisect_left(keys, key)
+            hi = bisect_left(keys, key + '\uffff', lo)
+            best = heapq.nlargest(limit, range(lo, hi), key=weights.__getitem__)
+            suggestions = [terms[i] for i in best]
+            if hi - lo > MEMO_MIN_MATCHES:
+                with self._lock:
+                    if len(self.memo) >= MEMO_CAPACITY:
+                        self.memo = {}
+                    self.memo[(key, limit)] = suggestions
+        if suggestions:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return suggestions
+
+    def record(self, text):
+        """Count a search for text towards the popularity of a matching suggestion"""
+        key = normalize_query(text)
+        with self._lock:
+            keys, _, weights = self.entries
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                weights[i] += 1
+                self.searches[key] = self.searches.get(key, 0) + 1
+                for memo_key in [k for k in self.memo if key.startswith(k[0])]:
+                    del self.memo[memo_key]
+
+    def build(self):
+        """Replace every entry with the titles load(None) yields"""
+        counts = {}
+        terms = {}
+        since = None
+        for title, last_modified in self.load(None):
+            key = normalize_query(title)
+            if not key:
+                continue
+            counts[key] = counts.get(key, 0) + 1
+            terms.setdefault(key, ' '.join(str(title).split()))
+            if last_modified and (since is None or last_modified > since):
+                since = last_modified
+        keys = sorted(counts)
+        with self._lock:
+            # Titles that are no longer indexed take their search counts with them
+            searches = {key: n for key, n in self.searches.items() if key in counts}
+            self.searches = searches
+        self.swap(keys, [terms[key] for key in keys], [counts[key] + searches.get(key, 0) for key in keys])
+        self.since = since
+        self.built_at = time.time()
+        self.ready = True
+        self.logger.info(f"Built autocomplete prefix index with {len(keys)} titles")
+
+    def update(self):
+        """Merge in titles indexed since the last build or update"""
+        keys, terms, weights = self.entries
+        merged = dict(zip(keys, zip(terms, weights)))
+        since = self.since
+        added = 0
+        for title, last_modified in self.load(self.since):
+            key = normalize_query(title)
+            if key and key not in merged:
+                merged[key] = (' '.join(str(title).split()), 1)
+                added += 1
+            if last_modified and (since is None or last_modified > since):
+                since = last_modified
+        if added:
+            keys = sorted(merged)
+            self.swap(keys, [merged[key][0] for key in keys], [merged[key][1] for key in keys])
+            self.logger.info(f"Added {added} titles to the autocomplete prefix index")
+        self.since = since
+
+    def swap(self, keys, terms, weights):
+        with self._lock:
+            self.entries = (keys, terms, weights)
+            self.memo = {}
+
+    def refresh(self):
+        """Rebuild when due, otherwise pick up new titles after an index commit"""
+        generation = self.generation.current() if self.generation is not None else None
+        if not self.ready or time.time() - self.built_at >= self.rebuild_interval:
+            self.build()
+        elif generation != self.refreshed_generation:
+            self.update()
+        self.refreshed_generation = generation
+
+    def start(self):
+        """Build in a daemon thread and keep the index fresh from it; lookups miss until built"""
+        if self._thread is not None:
+            return
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.logger.error(f"Error refreshing autocomplete prefix index: {str(e)}")
+                if self._stop.wait(self.refresh_interval):
+                    break
+
+        self._thread = threading.Thread(target=run, name='autocomplete-prefix-index', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self),
+            'ready': self.ready,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'since': self.since,
+            'generation': self.refreshed_generation
+        }
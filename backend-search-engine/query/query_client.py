@@ -0,0 +1,90 @@
+import base64
+import http.client
+import json
+import os
+import socket
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.config import load_section
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to a Unix domain socket instead of TCP"""
+
+    def __init__(self, socket_path, timeout=15):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class QueryClient:
+    """Thin client for query_server.py; sends the same arguments as the CLI entry point"""
+
+    def __init__(self, host='127.0.0.1', port=8765, socket_path=None, timeout=15):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.connection = None
+
+    @classmethod
+    def from_config(cls):
+        config = load_section('query_server')
+        return cls(host=config.get('host', '127.0.0.1'),
+                   port=int(config.get('port', 8765)),
+                   socket_path=config.get('socket_path'),
+                   timeout=config.get('timeout', 15))
+
+    def get_connection(self):
+        # Reuse one keep-alive connection across calls from the same client
+        if self.connection is None:
+            if self.socket_path:
+                self.connection = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            else:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self.connection
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def send(self, body):
+        for attempt in range(2):
+            connection = self.get_connection()
+            try:
+                connection.request('POST', '/', body=body, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                return json.loads(response.read().decode('utf-8'))
+            except (ConnectionError, http.client.HTTPException):
+                # Server closed an idle keep-alive connection; reconnect once
+                self.close()
+                if attempt:
+                    raise
+
+    def query(self, args):
+        """Send a decoded argument dict and return the decoded JSON response"""
+        return self.send(json.dumps(args).encode('utf-8'))
+
+    def query_encoded(self, encoded_args):
+        """Send the base64 encoded argument string the PHP middleware already builds"""
+        return self.send(encoded_args.encode('utf-8') if isinstance(encoded_args, str) else encoded_args)
+
+
+if __name__ == "__main__":
+    encoded_args = sys.argv[1] if len(sys.argv) > 1 else base64.b64encode(b'{}').decode('ascii')
+    client = QueryClient.from_config()
+    try:
+        print(json.dumps(client.query_encoded(encoded_args)))
+    except Exception as e:
+        print(json.dumps({
+            "status": "error",
+            "message": f"Query server unavailable: {str(e)}",
+            "args_received": sys.argv
+        }))
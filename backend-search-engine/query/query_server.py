@@ -0,0 +1,209 @@
+import json
+import logging
+import os
+import signal
+import socketserver
+import sys
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from embedding_cache import CachingEmbeddingProvider, EmbeddingCache, cache_name_for_model
+from embedding_provider import SentenceTransformerProvider, DEFAULT_EMBEDDING_MODEL
+from result_cache import ResultCache
+from prefix_index import PrefixIndex
+from query_solr_cloud import SolrCloudQueryEngine, handle_request, decode_args, serialize_response
+from common.config import load_section
+from common.index_generation import IndexGeneration
+
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """Accepts the same base64/JSON argument shape as the query_solr_cloud.py CLI"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self.send_json({'status': 'ok'})
+        elif self.path.rstrip('/') == '/stats':
+            self.send_json(self.server.engine.get_stats())
+        else:
+            self.send_json({'status': 'error', 'message': 'Not found'}, status=404)
+
+    def do_POST(self):
+        raw_body = b''
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            raw_body = self.rfile.read(length)
+            args = self.parse_args(raw_body)
+            result = handle_request(self.server.engine, args)
+            self.send_json(result)
+        except Exception as e:
+            error_details = {
+                "status": "error",
+                "message": str(e),
+                "traceback": traceback.format_exc(),
+                "args_received": raw_body.decode('utf-8', errors='replace')
+            }
+            self.send_json(error_details, status=500)
+
+    def parse_args(self, raw_body):
+        """Body is either a JSON object or the base64 string the CLI takes as argv[1]"""
+        body = raw_body.strip()
+        if not body:
+            return {}
+        if body.startswith(b'{'):
+            return json.loads(body.decode('utf-8'))
+        return decode_args(body)
+
+    def send_json(self, payload, status=200):
+        data = serialize_response(payload)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) tuple
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        self.server.logger.debug("%s - %s", self.address_string(), format % args)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class QueryServer:
+    """Keeps one warm SolrCloudQueryEngine and serves it over local HTTP or a Unix socket"""
+
+    def __init__(self, host='127.0.0.1', port=8765, socket_path=None, engine=None, preload_embeddings=True):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.engine = engine if engine is not None else SolrCloudQueryEngine()
+        # The engine silences logging so CLI stdout stays pure JSON; the server has no such constraint
+        logging.disable(logging.NOTSET)
+        self.logger = logging.getLogger(__name__)
+        self.httpd = None
+        self.preload_embeddings = preload_embeddings
+
+    def preload(self):
+        """Load the embedding model off the request path so the first semantic query is warm"""
+        def load():
+            try:
+                self.engine.embedding_model
+                self.logger.info("Embedding model loaded")
+            except Exception as e:
+                self.logger.error(f"Failed to preload embedding model: {str(e)}")
+        threading.Thread(target=load, daemon=True).start()
+
+    def create_server(self):
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            httpd = ThreadingUnixHTTPServer(self.socket_path, QueryRequestHandler)
+        else:
+            httpd = ThreadingHTTPServer((self.host, self.port), QueryRequestHandler)
+        httpd.engine = self.engine
+        httpd.logger = self.logger
+        return httpd
+
+    def serve_forever(self):
+        self.httpd = self.create_server()
+        if self.preload_embeddings:
+            self.preload()
+        # Node state is refreshed in the background instead of pinging on every request
+        self.engine.node_health.start()
+        if self.engine.prefix_index is not None:
+            self.engine.prefix_index.start()
+        address = self.socket_path or f"http://{self.host}:{self.httpd.server_address[1]}"
+        self.logger.info(f"Query server listening on {address}")
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.engine.node_health.stop()
+            if self.engine.prefix_index is not None:
+                self.engine.prefix_index.stop()
+            self.httpd.server_close()
+            self.flush_caches()
+            if self.socket_path and os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def flush_caches(self):
+        cache = getattr(self.engine.embedding_provider, 'cache', None)
+        if cache is not None:
+            cache.flush()
+
+    def shutdown(self):
+        if self.httpd:
+            self.httpd.shutdown()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[logging.StreamHandler()]
+    )
+
+    config = load_section('query_server')
+    host = config.get('host', '127.0.0.1')
+    # python query_server.py [port] [--no-result-cache]
+    flags = [arg for arg in sys.argv[1:] if arg.startswith('--')]
+    positional = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    port = int(positional[0]) if positional else int(config.get('port', 8765))
+    socket_path = config.get('socket_path')
+    preload_embeddings = config.get('preload_embeddings', True)
+    cache_config = config.get('embedding_cache', {})
+    solr_config = load_section('solr')
+    health_config = solr_config.get('node_health', {})
+    result_cache_config = config.get('result_cache', {})
+
+    embedding_provider = CachingEmbeddingProvider(
+        SentenceTransformerProvider(DEFAULT_EMBEDDING_MODEL),
+        EmbeddingCache(capacity=int(cache_config.get('capacity', 1024)),
+                       cache_dir=cache_config.get('cache_dir'),
+                       name=cache_name_for_model(DEFAULT_EMBEDDING_MODEL))
+    )
+    # Emptied whenever the indexer records a commit in the shared generation file
+    index_generation = IndexGeneration(solr_config.get('index_generation_path', '../data/index_generation.json'))
+    result_cache = None
+    if result_cache_config.get('enabled', True) and '--no-result-cache' not in flags:
+        result_cache = ResultCache(
+            capacity=int(result_cache_config.get('capacity', 1024)),
+            ttl=result_cache_config.get('ttl', 60),
+            generation=index_generation
+        )
+    candidate_cache_config = config.get('candidate_cache', {})
+    candidate_cache = ResultCache(capacity=int(candidate_cache_config.get('capacity', 256)),
+                                  ttl=candidate_cache_config.get('ttl', 300),
+                                  generation=index_generation)
+    engine = SolrCloudQueryEngine(embedding_provider=embedding_provider,
+                                  passage_search=config.get('passage_search', False),
+                                  result_cache=result_cache,
+                                  lean=config.get('lean_responses', True),
+                                  candidate_cache=candidate_cache)
+    prefix_config = config.get('prefix_index', {})
+    if prefix_config.get('enabled', True):
+        # Built from indexed titles; extended after each index commit, rebuilt periodically
+        engine.prefix_index = PrefixIndex(engine.iter_titles, generation=index_generation,
+                                          refresh_interval=prefix_config.get('refresh_interval', 10),
+                                          rebuild_interval=prefix_config.get('rebuild_interval', 3600))
+    engine.node_health.configure(health_config)
+
+    server = QueryServer(host=host, port=port, socket_path=socket_path, engine=engine,
+                         preload_embeddings=preload_embeddings)
+
+    def handle_sigterm(signum, frame):
+        # Service managers stop the server with SIGTERM; persist the caches before exiting
+        server.flush_caches()
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -7,43 +7,142 @@ import time
 import sys
 import base64
 import traceback
-from sentence_transformers import SentenceTransformer
-import pysolr
 import warnings
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.http_transport import get_transport, transport_stats
+from common.node_health import NodeHealthTracker
+from common.solr_schema import PARENT_FILTER
+from embedding_provider import SentenceTransformerProvider, DEFAULT_EMBEDDING_MODEL
+from embedding_cache import CachingEmbeddingProvider, EmbeddingCache, normalize_query
+from result_cache import ResultCache, canonical_facets, result_cache_key
+
 warnings.filterwarnings("ignore", category=FutureWarning)
 
+# Several passages of one document can be among the nearest vectors, so passage search
+# asks kNN for this many times more candidates before they collapse into documents
+PASSAGE_TOPK_FACTOR = 4
+# Smallest candidate list a semantic query computes; it doubles as pages reach past its end
+KNN_CANDIDATES = 100
+# Hybrid search fuses the top HYBRID_CANDIDATES lexical and vector hits (or re-ranks that many)
+HYBRID_CANDIDATES = 100
+# Damping constant of reciprocal-rank fusion: score = sum of 1 / (RRF_K + rank)
+RRF_K = 60
+# Lifts every kNN hit above any BM25-only hit, so one window holds both candidate lists
+VECTOR_BOOST = 1000
+# Stored fields format_response reads; everything else (the embedding vector above all) stays in Solr
+RESPONSE_FIELDS = 'id,title,url,body,meta_description,score,last_modified,domain'
+# Highlighting bounded to a few short fragments from the start of each field
+HIGHLIGHT_PARAMS = {
+    'hl': 'true',
+    'hl.fl': 'title,body',
+    'hl.simple.pre': '<mark>',
+    'hl.simple.post': '</mark>',
+    'hl.snippets': 2,
+    'hl.fragsize': 160,
+    'hl.maxAnalyzedChars': 20000
+}
+
 class SolrCloudQueryEngine:
     def __init__(self, solr_urls=['http://localhost:8984/solr/search_collection', 
                                   'http://localhost:7574/solr/search_collection',
-                                  ]):
+                                  ],
+                 embedding_provider=None, passage_search=False, result_cache=None, lean=True,
+                 candidate_cache=None, prefix_index=None):
         self.solr_urls = solr_urls
-        self.current_url_index = 0
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Match the query vector against passage child documents instead of whole-document vectors
+        self.passage_search = passage_search
+        # Lean responses project fl onto RESPONSE_FIELDS and bound highlighting; lean=False
+        # returns whole stored documents as before
+        self.lean = lean
+        # Keep-alive connection pool per node instead of a new TCP connection per call
+        self.http = get_transport('solr')
+        # Shared with the indexer; keeps the last known node state so requests skip the per-call ping
+        self.node_health = NodeHealthTracker(solr_urls)
+        # The encoder is only loaded on the first semantic request; repeated queries come from the cache
+        self.embedding_provider = embedding_provider or CachingEmbeddingProvider(
+            SentenceTransformerProvider(DEFAULT_EMBEDDING_MODEL), EmbeddingCache())
+        # Optional ResultCache of raw Solr responses; only worth it in the long-lived query server
+        self.result_cache = result_cache
+        # Ranked kNN candidate ids per query, so semantic pages after the first skip the kNN search
+        self.candidate_cache = candidate_cache if candidate_cache is not None else ResultCache(capacity=256, ttl=300)
+        # Optional in-memory PrefixIndex answering autocomplete before /suggest is asked
+        self.prefix_index = prefix_index
 
         logging.disable(logging.CRITICAL)
         self.logger = logging.getLogger(__name__) # Still keep logger for potential future use
 
+    @property
+    def embedding_model(self):
+        return self.embedding_provider.model
+
+    def get_stats(self):
+        """Runtime counters for the long-lived query server"""
+        stats = {}
+        cache = getattr(self.embedding_provider, 'cache', None)
+        if cache is not None:
+            stats['embedding_cache'] = cache.stats()
+        if self.result_cache is not None:
+            stats['result_cache'] = self.result_cache.stats()
+        stats['candidate_cache'] = self.candidate_cache.stats()
+        if self.prefix_index is not None:
+            stats['prefix_index'] = self.prefix_index.stats()
+        stats['http'] = transport_stats()
+        return stats
+
     def get_active_solr_url(self):
-        initial_index = self.current_url_index
-        for _ in range(len(self.solr_urls)):
-            url = self.solr_urls[self.current_url_index]
-            try:
-                response = requests.get(f"{url}/admin/ping", timeout=5)
-                if response.status_code == 200:
-                    return url
-            except requests.exceptions.RequestException:
-                self.logger.error(f"Solr node {url} is unreachable. Trying next...")
-            
-            self.current_url_index = (self.current_url_index + 1) % len(self.solr_urls)
-            if self.current_url_index == initial_index:
-                break
-        
-        self.logger.warning("No active Solr nodes found, returning first URL. Search may fail.")
-        return self.solr_urls[0]
+        return self.node_health.get_url()
+
+    def cached_result(self, key):
+        if self.result_cache is None:
+            return None
+        return self.result_cache.get(key)
+
+    def store_result(self, key, result, started):
+        """Cache a Solr response; the empty fallbacks returned on errors have no responseHeader"""
+        if self.result_cache is not None and 'responseHeader' in result:
+            self.result_cache.put(key, result, time.perf_counter() - started)
+
+    def response_params(self, debug=False):
+        """fl, highlighting and debug parameters shared by every search; explain output is
+        only computed when a request asks for debug"""
+        if self.lean:
+            params = dict(HIGHLIGHT_PARAMS, fl=RESPONSE_FIELDS)
+        else:
+            params = {
+                'hl': 'true',
+                'hl.fl': 'title,body',
+                'hl.simple.pre': '<mark>',
+                'hl.simple.post': '</mark>',
+                'fl': '*,score'
+            }
+        if debug or not self.lean:
+            params['debugQuery'] = 'true'
+        return params
+
+    def apply_cursor(self, params, cursor):
+        """Switch params to cursorMark paging, which needs start=0 and the id as a final tiebreak"""
+        sort = params.get('sort') or 'score desc'
+        if not any(clause.split()[0] == 'id' for clause in sort.split(',') if clause.strip()):
+            sort += ', id asc'
+        params['sort'] = sort
+        params['start'] = 0
+        params['cursorMark'] = cursor
+
+    def report_failure(self, solr_url, error):
+        """Take a node out of rotation when it could not be reached"""
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            self.node_health.mark_failure(solr_url, error)
     
     def _build_filter_queries(self, facets):
-        fq_list = []
+        # Passage child documents are only ever matched through the block join
+        fq_list = [PARENT_FILTER]
         if facets:
             for field, values in facets.items():
                 if values and isinstance(values, list):
@@ -56,9 +155,17 @@ class SolrCloudQueryEngine:
     def generate_query_embedding(self, query_text):
         if not query_text:
             return []
-        return self.embedding_model.encode(query_text).tolist()
+        return self.embedding_provider.encode(query_text).tolist()
 
-    def simple_search(self, query, start=0, rows=10, sort=None, facets=None):
+    def simple_search(self, query, start=0, rows=10, sort=None, facets=None, debug=False, cursor=None):
+        """Lexical search; with cursor ('*' for the first page, then the previous response's
+        nextCursorMark) pages by cursorMark instead of start, which stays cheap at any depth"""
+        key = result_cache_key('simple', query=query, start=start, rows=rows, sort=sort,
+                               facets=canonical_facets(facets), debug=debug, cursor=cursor)
+        cached = self.cached_result(key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
         solr_url = self.get_active_solr_url()
         
         params = {
@@ -66,14 +173,9 @@ class SolrCloudQueryEngine:
             'start': start,
             'rows': rows,
             'wt': 'json',
-            'hl': 'true',
-            'hl.fl': 'title,body',
-            'hl.simple.pre': '<mark>',
-            'hl.simple.post': '</mark>',
             'facet': 'true',
             'facet.mincount': 1,
-            'fl': '*,score', 
-            'debugQuery': 'true' 
+            **self.response_params(debug)
         }
         
         params['facet.field'] = [
@@ -82,66 +184,262 @@ class SolrCloudQueryEngine:
         
         if sort:
             params['sort'] = sort
+        if cursor:
+            self.apply_cursor(params, cursor)
         
         filter_queries = self._build_filter_queries(facets)
         if filter_queries:
             params['fq'] = filter_queries 
 
         try:
-            response = requests.get(f"{solr_url}/select", params=params, timeout=10)
+            response = self.http.get(f"{solr_url}/select", params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            result = parse_json(response.content)
+            self.store_result(key, result, started)
+            return result
         except Exception as e:
             self.logger.error(f"Error during simple search {query}: {str(e)}")
+            self.report_failure(solr_url, e)
             return {'response': {'docs': [], 'numFound': 0}}
     
-    def semantic_search(self, query_text, start=0, rows=10, facets=None):
-        solr_url = self.get_active_solr_url()
-        
+    def semantic_search(self, query_text, start=0, rows=10, facets=None, passages=None, debug=False):
+        """kNN search over document vectors, or with passages over passage child documents,
+        each parent scored by its best matching passage.
+
+        The ranked candidate ids of a query are computed once and cached; a page only fetches
+        the stored fields of the ids in its slice, and the candidate list grows when a page
+        reaches past its end.
+        """
+        passages = self.passage_search if passages is None else passages
+        # The vector is a pure function of the model and normalized text, so those stand in for it
+        key = result_cache_key('semantic', query=normalize_query(query_text),
+                               model=self.embedding_provider.model_name, start=start, rows=rows,
+                               facets=canonical_facets(facets), passages=bool(passages), debug=debug)
+        cached = self.cached_result(key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+
+        candidates = self.knn_candidates(query_text, start + rows, facets, passages, debug)
+        if candidates is None:
+            return {'response': {'docs': [], 'numFound': 0}}
+
+        page = candidates['ids'][start:start + rows]
+        docs = self.fetch_documents(page) if page else []
+        if docs is None:
+            return {'response': {'docs': [], 'numFound': 0}}
+        scores = dict(zip(candidates['ids'], candidates['scores']))
+        for doc in docs:
+            doc['score'] = scores.get(doc['id'], 0)
+
+        num_found = candidates['numFound']
+        if not candidates['complete']:
+            # More neighbours exist than the list holds; announce the size it grows to next,
+            # so pagers offer the pages after it
+            num_found = max(num_found, 2 * len(candidates['ids']))
+        result = {
+            'responseHeader': candidates['responseHeader'],
+            'response': {'numFound': num_found, 'numFoundExact': candidates['complete'],
+                         'start': start, 'docs': docs},
+            'facet_counts': candidates['facet_counts']
+        }
+        if 'debug' in candidates:
+            result['debug'] = candidates['debug']
+        self.store_result(key, result, started)
+        return result
+
+    def knn_candidates(self, query_text, needed, facets=None, passages=False, debug=False):
+        """Ranked ids and scores of the nearest documents, with the facet counts of the whole
+        candidate set; kept in the candidate cache so later pages skip the kNN search"""
+        key = result_cache_key('knn', query=normalize_query(query_text),
+                               model=self.embedding_provider.model_name,
+                               facets=canonical_facets(facets), passages=bool(passages), debug=debug)
+        candidates = self.candidate_cache.get(key)
+        if candidates is not None and (len(candidates['ids']) >= needed or candidates['complete']):
+            return candidates
+        if candidates is not None and candidates.get('fallback'):
+            # Passages already failed for this query; grow the document-vector list instead
+            return self.knn_candidates(query_text, needed, facets, passages=False, debug=debug)
+        started = time.perf_counter()
+
         query_vector = self.generate_query_embedding(query_text)
         if not query_vector:
-            return {'response': {'docs': [], 'numFound': 0}}
+            return None
 
-        topK = max(rows, 100) 
-        
+        # Grow geometrically so paging forward does not rerun kNN on every page
+        topK = max(needed, KNN_CANDIDATES, 2 * len(candidates['ids']) if candidates else 0)
         vector_string = json.dumps(query_vector)
-        
-        solr_client = pysolr.Solr(solr_url, always_commit=True, timeout=10)
 
         params = {
-            'start': start,
-            'rows': rows,
-            'fl': '*,score', 
-            'hl': 'true',
-            'hl.fl': 'title,body',
-            'hl.simple.pre': '<mark>',
-            'hl.simple.post': '</mark>',
+            'q': f"{{!knn f=embedding_vector topK={topK}}}{vector_string}",
+            'wt': 'json',
+            'start': 0,
+            'rows': topK,
+            'fl': 'id,score',
             'facet': 'true',
             'facet.mincount': 1,
-            'debugQuery': 'true', 
-            'facet.field': ['{!ex=domain_filter}domain'] 
+            'facet.field': ['{!ex=domain_filter}domain']
         }
-        
+        if debug:
+            params['debugQuery'] = 'true'
+
+        if passages:
+            # Block join: passage hits collapse into their parent, scored by the best passage
+            params['q'] = '{!parent which=$allParents score=max v=$passage_knn}'
+            params['allParents'] = PARENT_FILTER
+            params['passage_knn'] = f"{{!knn f=passage_vector topK={topK * PASSAGE_TOPK_FACTOR}}}{vector_string}"
+
+        filter_queries = self._build_filter_queries(facets)
+        if filter_queries:
+            params['fq'] = filter_queries
+
+        result = None
+        rejected = False
+        for attempt in range(len(self.solr_urls)):
+            solr_url = self.get_active_solr_url()
+            try:
+                # POST keeps the 384-float vector out of the URL
+                response = self.http.post(f"{solr_url}/select", data=params, timeout=10)
+                response.raise_for_status()
+                result = parse_json(response.content)
+                break
+            except Exception as e:
+                self.logger.error(f"Error during semantic search {query_text}: {str(e)}")
+                self.report_failure(solr_url, e)
+                if not isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+                    # Solr rejected the query itself; another node would reject it too
+                    rejected = True
+                    break
+        if result is None and not (passages and rejected):
+            return None
+
+        if passages and (result is None or not result.get('response', {}).get('numFound')):
+            # Schema without passage_vector, or index built without passages: fall back to
+            # whole-document vectors, and remember that under the passage key so later pages
+            # do not retry the passage query
+            candidates = self.knn_candidates(query_text, needed, facets, passages=False, debug=debug)
+            if candidates is not None:
+                self.candidate_cache.put(key, dict(candidates, fallback=True), time.perf_counter() - started)
+            return candidates
+
+        docs = result.get('response', {}).get('docs', [])
+        candidates = {
+            'ids': [doc['id'] for doc in docs],
+            'scores': [doc.get('score', 0) for doc in docs],
+            'numFound': result.get('response', {}).get('numFound', 0),
+            # Fewer hits than asked for: there is nothing further to page into
+            'complete': len(docs) < topK,
+            'responseHeader': result.get('responseHeader', {}),
+            'facet_counts': result.get('facet_counts', {})
+        }
+        if 'debug' in result:
+            candidates['debug'] = result['debug']
+        self.candidate_cache.put(key, candidates, time.perf_counter() - started)
+        return candidates
+
+    def fetch_documents(self, ids):
+        """Stored fields of the given documents in the order of ids, or None on error"""
+        solr_url = self.get_active_solr_url()
+        params = {
+            'q': '{!terms f=id}' + ','.join(ids),
+            'fq': [PARENT_FILTER],
+            'wt': 'json',
+            'start': 0,
+            'rows': len(ids),
+            **self.response_params()
+        }
+        # A kNN query has no terms to highlight
+        params['hl'] = 'false'
+        try:
+            response = self.http.post(f"{solr_url}/select", data=params, timeout=10)
+            response.raise_for_status()
+            docs = parse_json(response.content).get('response', {}).get('docs', [])
+        except Exception as e:
+            self.logger.error(f"Error fetching {len(ids)} documents: {str(e)}")
+            self.report_failure(solr_url, e)
+            return None
+        order = {doc_id: n for n, doc_id in enumerate(ids)}
+        return sorted(docs, key=lambda doc: order.get(doc.get('id'), len(order)))
+
+    def hybrid_search(self, query_text, start=0, rows=10, facets=None, fusion='rrf', debug=False):
+        """Lexical and kNN retrieval over document vectors in one Solr request.
+
+        fusion='rrf' fetches the union of the top lexical hits and the top kNN hits with both
+        scores as pseudo-fields and ranks it by reciprocal-rank fusion. fusion='rerank' runs
+        the lexical query and re-scores its top hits by vector similarity. Both cover at
+        least HYBRID_CANDIDATES hits and always reach past the requested page.
+        """
+        # The text goes to Solr as a Lucene query, where case matters (AND vs and): collapse
+        # whitespace only; the embedding cache still keys the vector on the lowercased form
+        key = result_cache_key('hybrid', query=' '.join(str(query_text).split()),
+                               model=self.embedding_provider.model_name, start=start, rows=rows,
+                               facets=canonical_facets(facets), fusion=fusion, debug=debug)
+        cached = self.cached_result(key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
+        solr_url = self.get_active_solr_url()
+
+        query_vector = self.generate_query_embedding(query_text)
+        if not query_vector:
+            return {'response': {'docs': [], 'numFound': 0}}
+
+        window = max(start + rows, HYBRID_CANDIDATES)
+        params = {
+            'lexq': query_text,
+            'vecq': f"{{!knn f=embedding_vector topK={window}}}{json.dumps(query_vector)}",
+            'wt': 'json',
+            'facet': 'true',
+            'facet.mincount': 1,
+            'facet.field': ['{!ex=domain_filter}domain'],
+            **self.response_params(debug),
+            # The kNN clause has no terms to highlight
+            'hl.q': query_text
+        }
+        if fusion == 'rerank':
+            params.update({
+                'q': '{!v=$lexq}',
+                'rq': f"{{!rerank reRankQuery=$vecq reRankDocs={window} reRankWeight=2}}",
+                'start': start,
+                'rows': rows
+            })
+        else:
+            # kNN hits rank first (boosted), then lexical-only hits by BM25: a window of the
+            # kNN topK plus window more rows always contains both top-window lists
+            params.update({
+                'q': '{!bool should=$lexq should=$boosted_vecq}',
+                'boosted_vecq': f"{{!boost b={VECTOR_BOOST} v=$vecq}}",
+                'start': 0,
+                'rows': 2 * window
+            })
+            params['fl'] += ',lexical_score:query($lexq,0),vector_score:query($vecq,0)'
+
         filter_queries = self._build_filter_queries(facets)
         if filter_queries:
             params['fq'] = filter_queries
 
         try:
-            results = solr_client.search(
-                q=f"{{!knn f=embedding_vector topK={topK}}}{vector_string}",
-                search_handler='/select', 
-                method='POST', 
-                **params 
-            )
-            return results.raw_response 
+            # POST keeps the 384-float vector out of the URL
+            response = self.http.post(f"{solr_url}/select", data=params, timeout=10)
+            response.raise_for_status()
+            result = parse_json(response.content)
         except Exception as e:
-            self.logger.error(f"Error during semantic search {query_text}: {str(e)}")
-            self.current_url_index = (self.current_url_index + 1) % len(self.solr_urls)
-            if self.current_url_index != (self.solr_urls.index(solr_url) + 1) % len(self.solr_urls):
-                return self.semantic_search(query_text, start, rows, facets)
-            return {'response': {'docs':[], 'numFound': 0}} 
+            self.logger.error(f"Error during hybrid search {query_text}: {str(e)}")
+            self.report_failure(solr_url, e)
+            return {'response': {'docs': [], 'numFound': 0}}
+
+        if fusion != 'rerank':
+            docs = reciprocal_rank_fusion(result.get('response', {}).get('docs', []), window)
+            result['response']['docs'] = docs[start:start + rows]
+        self.store_result(key, result, started)
+        return result
 
     def dsl_search(self, dsl_query):
+        key = result_cache_key('dsl', dsl=dict(dsl_query, facets=canonical_facets(dsl_query.get('facets'))))
+        cached = self.cached_result(key)
+        if cached is not None:
+            return cached
+        started = time.perf_counter()
         solr_url = self.get_active_solr_url()
         solr_query = self.build_solr_query(dsl_query)
         
@@ -150,14 +448,9 @@ class SolrCloudQueryEngine:
             'start': dsl_query.get('start', 0),
             'rows': dsl_query.get('rows', 10),
             'wt': 'json',
-            'hl': 'true',
-            'hl.fl': 'title,body',
-            'hl.simple.pre': '<mark>',
-            'hl.simple.post': '</mark>',
             'facet': 'true',
             'facet.mincount': 1,
-            'fl': '*,score', 
-            'debugQuery': 'true' 
+            **self.response_params(dsl_query.get('debug', False))
         }
         params['facet.field'] = [
             '{!ex=domain_filter}domain',
@@ -167,6 +460,8 @@ class SolrCloudQueryEngine:
             sort_field = dsl_query['sort']['field']
             sort_direction = dsl_query['sort']['direction']
             params['sort'] = f"{sort_field} {sort_direction}"
+        if dsl_query.get('cursor'):
+            self.apply_cursor(params, dsl_query['cursor'])
         
         if 'boost' in dsl_query and dsl_query['boost']:
             boost_params = []
@@ -179,11 +474,14 @@ class SolrCloudQueryEngine:
             params['fq'] = filter_queries
         
         try:
-            response = requests.get(f"{solr_url}/select", params=params, timeout=10)
+            response = self.http.get(f"{solr_url}/select", params=params, timeout=10)
             response.raise_for_status()
-            return response.json()
+            result = parse_json(response.content)
+            self.store_result(key, result, started)
+            return result
         except Exception as e:
             self.logger.error(f"Error during DSL search: {str(e)}")
+            self.report_failure(solr_url, e)
             return {'response': {'docs': [], 'numFound': 0}}
   
     def build_solr_query(self, dsl_query):
@@ -223,6 +521,10 @@ class SolrCloudQueryEngine:
         return final_query
 
     def autocomplete(self, query, field='title_suggest', limit=5):
+        if self.prefix_index is not None:
+            suggestions = self.prefix_index.lookup(query, limit)
+            if suggestions:
+                return suggestions
         solr_url = self.get_active_solr_url()
         
         params = {
@@ -234,9 +536,9 @@ class SolrCloudQueryEngine:
         }
         
         try:
-            response = requests.get(f"{solr_url}/suggest", params=params, timeout=5)
+            response = self.http.get(f"{solr_url}/suggest", params=params, timeout=5)
             response.raise_for_status()
-            data = response.json()
+            data = parse_json(response.content)
             
             suggestions = []
             suggest_data = data.get('suggest', {}).get('mySuggester', {})
@@ -247,25 +549,43 @@ class SolrCloudQueryEngine:
             return suggestions
         except Exception as e:
             self.logger.error(f"Error during autocomplete for query '{query}': {str(e)}")
+            self.report_failure(solr_url, e)
             return []
     
-    def get_cluster_status(self):
-        status = {}
-        for i, url in enumerate(self.solr_urls):
+    def iter_titles(self, since=None, page_size=1000):
+        """(title, last_modified) of every indexed document, or of those modified at or after
+        since, paged with cursorMark; feeds the autocomplete PrefixIndex"""
+        params = {
+            'q': '*:*',
+            'fq': [PARENT_FILTER],
+            'fl': 'title,last_modified',
+            'sort': 'id asc',
+            'rows': page_size,
+            'wt': 'json'
+        }
+        if since:
+            params['fq'].append(f"last_modified:[{since} TO *]")
+        cursor = '*'
+        while True:
+            params['cursorMark'] = cursor
+            solr_url = self.get_active_solr_url()
             try:
-                response = requests.get(f"{url}/admin/ping", timeout=5)
-                status[f"node_{i+1}"] = {
-                    "url": url,
-                    "status": "active" if response.status_code == 200 else "inactive",
-                    "response_time": response.elapsed.total_seconds()
-                }
+                response = self.http.get(f"{solr_url}/select", params=params, timeout=30)
+                response.raise_for_status()
+                result = parse_json(response.content)
             except Exception as e:
-                status[f"node_{i+1}"] = {
-                    "url": url,
-                    "status": "inactive",
-                    "error": str(e)
-                }
-        return status
+                self.report_failure(solr_url, e)
+                raise
+            for doc in result.get('response', {}).get('docs', []):
+                if doc.get('title'):
+                    yield doc['title'], doc.get('last_modified')
+            next_cursor = result.get('nextCursorMark', cursor)
+            if next_cursor == cursor:
+                return
+            cursor = next_cursor
+
+    def get_cluster_status(self):
+        return self.node_health.cluster_status()
   
     def format_response(self, solr_response):
         docs = solr_response.get('response', {}).get('docs', [])
@@ -310,54 +630,105 @@ class SolrCloudQueryEngine:
                 if i + 1 < len(values):
                     formatted_facets[field][values[i]] = values[i + 1]
 
-        return {
+        formatted = {
             'docs': formatted_docs,
             'numFound': num_found,
             'facets': formatted_facets,
             'cluster_status': self.get_cluster_status(),
             'debug': debug_info 
         }
+        if 'nextCursorMark' in solr_response:
+            formatted['nextCursorMark'] = solr_response['nextCursorMark']
+        return formatted
+
+def reciprocal_rank_fusion(docs, depth, k=RRF_K):
+    """Order docs by the sum of 1 / (k + rank) over their rank in the top depth by
+    lexical_score and by vector_score; score becomes the fused score"""
+    fused = {}
+    for field in ('lexical_score', 'vector_score'):
+        ranked = sorted((doc for doc in docs if doc.get(field)), key=lambda doc: doc[field], reverse=True)
+        for rank, doc in enumerate(ranked[:depth], 1):
+            fused[doc['id']] = fused.get(doc['id'], 0.0) + 1.0 / (k + rank)
+    docs = [doc for doc in docs if doc['id'] in fused]
+    for doc in docs:
+        doc['score'] = fused[doc['id']]
+    return sorted(docs, key=lambda doc: doc['score'], reverse=True)
+
+def handle_request(engine, args):
+    """Dispatch one decoded argument dict to the matching engine call"""
+    debug = bool(args.get("debug", False))
+    if "dsl_query" in args:
+        dsl_query = args["dsl_query"]
+        if debug:
+            dsl_query = dict(dsl_query, debug=True)
+        result = engine.dsl_search(dsl_query)
+        return engine.format_response(result)
+
+    elif args.get("autocomplete", False):
+        query = args.get("query", "*:*")
+        field = args.get("field", "title_suggest")
+        limit = int(args.get("limit", 5))
+        suggestions = engine.autocomplete(query, field, limit)
+        return {"suggestions": suggestions}
+
+    elif args.get("semantic_search", False): 
+        query = args.get("query", "*:*")
+        start = int(args.get("start", 0))
+        rows = int(args.get("rows", 10))
+        facets = args.get("facets", None)
+        passages = args.get("passages", None)
+        result = engine.semantic_search(query, start=start, rows=rows, facets=facets, passages=passages,
+                                        debug=debug)
+        return engine.format_response(result)
+
+    elif args.get("hybrid_search", False):
+        query = args.get("query", "*:*")
+        start = int(args.get("start", 0))
+        rows = int(args.get("rows", 10))
+        facets = args.get("facets", None)
+        fusion = args.get("fusion", "rrf")
+        result = engine.hybrid_search(query, start=start, rows=rows, facets=facets, fusion=fusion, debug=debug)
+        return engine.format_response(result)
+
+    else:
+        query = args.get("query", "*:*")
+        start = int(args.get("start", 0))
+        rows = int(args.get("rows", 10))
+        facets = args.get("facets", None)
+        cursor = args.get("cursor", None)
+        if engine.prefix_index is not None:
+            # Searches for a suggestion make it rank higher next time
+            engine.prefix_index.record(query)
+        result = engine.simple_search(query, start=start, rows=rows, facets=facets, debug=debug, cursor=cursor)
+        return engine.format_response(result)
+
+def parse_json(content):
+    """Decode a Solr response body, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+def serialize_response(payload):
+    """Encode a formatted response as compact UTF-8 JSON, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def decode_args(encoded_args):
+    """Decode the base64 encoded JSON argument passed in by the PHP middleware"""
+    decoded_json = base64.b64decode(encoded_args).decode('utf-8')
+    return json.loads(decoded_json)
 
 if __name__ == "__main__":
     try:
         logging.disable(logging.CRITICAL)
         
         encoded_args = sys.argv[1] if len(sys.argv) > 1 else '{}'
-        decoded_json = base64.b64decode(encoded_args).decode('utf-8')
-        args = json.loads(decoded_json)
+        args = decode_args(encoded_args)
 
         engine = SolrCloudQueryEngine()
-
-        if "dsl_query" in args:
-            dsl_query = args["dsl_query"]
-            result = engine.dsl_search(dsl_query)
-            formatted = engine.format_response(result)
-            print(json.dumps(formatted))
-        
-        elif args.get("autocomplete", False):
-            query = args.get("query", "*:*")
-            field = args.get("field", "title_suggest")
-            limit = int(args.get("limit", 5))
-            suggestions = engine.autocomplete(query, field, limit)
-            print(json.dumps({"suggestions": suggestions}))
-
-        elif args.get("semantic_search", False): 
-            query = args.get("query", "*:*")
-            start = int(args.get("start", 0))
-            rows = int(args.get("rows", 10))
-            facets = args.get("facets", None)
-            result = engine.semantic_search(query, start=start, rows=rows, facets=facets)
-            formatted = engine.format_response(result)
-            print(json.dumps(formatted))
-
-        else:
-            query = args.get("query", "*:*")
-            start = int(args.get("start", 0))
-            rows = int(args.get("rows", 10))
-            facets = args.get("facets", None)
-            result = engine.simple_search(query, start=start, rows=rows, facets=facets)
-            formatted = engine.format_response(result)
-            print(json.dumps(formatted))
+        # Raw UTF-8 bytes, so non-ASCII text never depends on the console encoding
+        sys.stdout.buffer.write(serialize_response(handle_request(engine, args)) + b'\n')
 
     except Exception as e:
         error_details = {
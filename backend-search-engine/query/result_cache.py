@@ -0,0 +1,95 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def canonical_facets(facets):
+    """Facet filters with fields and values sorted, so equivalent selections share a key"""
+    if not facets:
+        return None
+    canonical = {}
+    for field, values in facets.items():
+        if values and isinstance(values, list):
+            canonical[field] = sorted(str(value) for value in values)
+    return canonical or None
+
+
+def result_cache_key(mode, **parts):
+    """Canonical string key for one search: mode plus its sorted, compactly encoded arguments"""
+    return json.dumps([mode, parts], sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+class ResultCache:
+    """LRU cache of raw Solr responses with a TTL, emptied whenever the index generation changes.
+
+    generation is an IndexGeneration (or anything with current()); when the indexer commits,
+    every cached result is dropped on the next lookup. hits also add up the latency of the
+    original Solr call, which is reported as saved time.
+    """
+
+    def __init__(self, capacity=1024, ttl=60, generation=None):
+        self.capacity = capacity
+        self.ttl = ttl
+        self.generation = generation
+        self.entries = OrderedDict()   # key -> (expires_at, result, seconds the original call took)
+        self.cached_generation = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def check_generation(self):
+        if self.generation is None:
+            return
+        current = self.generation.current()
+        if current != self.cached_generation:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.cached_generation = current
+
+    def get(self, key):
+        with self._lock:
+            self.check_generation()
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry[2]
+            return entry[1]
+
+    def put(self, key, result, seconds=0.0):
+        with self._lock:
+            self.check_generation()
+            self.entries[key] = (time.monotonic() + self.ttl, result, seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self.entries),
+                'capacity': self.capacity,
+                'ttl': self.ttl,
+                'generation': self.cached_generation,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'saved_seconds': round(self.saved_seconds, 3)
+            }
@@ -30,7 +30,7 @@ function handleAutocomplete() {
         ];
 
         $pythonScript = "C:/RITU/solr-search-engine/backend-search-engine/query/query_solr_cloud.py";
-        $result = callPythonScript($pythonScript, $args);
+        $result = callQueryServer($pythonScript, $args);
 
         if ($result === false) {
             throw new Exception('Failed to get autocomplete suggestions');
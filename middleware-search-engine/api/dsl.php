@@ -53,7 +53,7 @@ function handleDSLSearch() {
         
         error_log("DSL Query being sent to Python: " . json_encode($pythonArgs));
         
-        $result = callPythonScript($pythonScript, $pythonArgs);
+        $result = callQueryServer($pythonScript, $pythonArgs);
 
         if ($result === false) {
             throw new Exception('Failed to execute DSL search - Python script error');
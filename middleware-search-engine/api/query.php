@@ -25,6 +25,7 @@ function handleSearch() {
         $sort = isset($input['sort']) ? $input['sort'] : null;
         $facets = isset($input['facets']) ? $input['facets'] : []; // Extract facets
         $semanticSearch = isset($input['semantic_search']) ? (bool)$input['semantic_search'] : false; 
+        $hybridSearch = isset($input['hybrid_search']) ? (bool)$input['hybrid_search'] : false;
 
         $args = [
             'start' => $start,
@@ -35,6 +36,12 @@ function handleSearch() {
         if ($semanticSearch) {
             $args['semantic_search'] = true;
             $args['query'] = sanitizeInput($query); // Query text for embedding
+        } elseif ($hybridSearch) {
+            $args['hybrid_search'] = true;
+            $args['query'] = sanitizeInput($query); // Lexical query, also embedded for kNN
+            if (isset($input['fusion'])) {
+                $args['fusion'] = $input['fusion'] === 'rerank' ? 'rerank' : 'rrf';
+            }
         } elseif (is_array($query) && isset($query['conditions'])) {
             $args['dsl_query'] = $query;
         } else {
@@ -42,6 +49,10 @@ function handleSearch() {
             if ($sort) {
                 $args['sort'] = $sort;
             }
+            // cursorMark paging: '*' for the first page, then the returned nextCursorMark
+            if (isset($input['cursor'])) {
+                $args['cursor'] = (string)$input['cursor'];
+            }
         }
 
         // Log the arguments being sent to Python for debugging
@@ -55,8 +66,13 @@ function handleSearch() {
             $args['facets'] = $facets;
         }
 
+        // Solr explain output is only computed when asked for
+        if (!empty($input['debug'])) {
+            $args['debug'] = true;
+        }
+
         $pythonScript = "C:/RITU/solr-search-engine/backend-search-engine/query/query_solr_cloud.py";
-        $result = callPythonScript($pythonScript, $args);
+        $result = callQueryServer($pythonScript, $args);
 
         if ($result === false) {
             throw new Exception('Failed to execute search');
@@ -101,7 +117,7 @@ function handleGet() {
     }
     
     $pythonScript = 'C:/RITU/solr-search-engine/backend-search-engine/query/query_solr_cloud.py';
-    $result = callPythonScript($pythonScript, $args);
+    $result = callQueryServer($pythonScript, $args);
     
     if ($result === false) {
         http_response_code(500);
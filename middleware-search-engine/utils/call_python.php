@@ -45,4 +45,44 @@ function callPythonScript($scriptPath, $args = []) {
     }
 }
 
+/**
+ * Send the same arguments to the long-lived query server (query/query_server.py),
+ * which keeps one warm engine instead of starting Python per request.
+ * Falls back to spawning the script when the server is not reachable.
+ */
+function callQueryServer($scriptPath, $args = [], $serverUrl = 'http://127.0.0.1:8765/') {
+    try {
+        $payload = base64_encode(json_encode($args));
+
+        $ch = curl_init($serverUrl);
+        curl_setopt($ch, CURLOPT_POST, true);
+        curl_setopt($ch, CURLOPT_POSTFIELDS, $payload);
+        curl_setopt($ch, CURLOPT_RETURNTRANSFER, true);
+        curl_setopt($ch, CURLOPT_CONNECTTIMEOUT_MS, 200);
+        curl_setopt($ch, CURLOPT_TIMEOUT, 15);
+        curl_setopt($ch, CURLOPT_HTTPHEADER, ['Content-Type: text/plain']);
+
+        $result = curl_exec($ch);
+        $httpCode = curl_getinfo($ch, CURLINFO_HTTP_CODE);
+        curl_close($ch);
+
+        if ($result === false || $httpCode === 0) {
+            error_log("Query server unreachable at $serverUrl, falling back to script");
+            return callPythonScript($scriptPath, $args);
+        }
+
+        $decoded = json_decode($result, true);
+        if (json_last_error() !== JSON_ERROR_NONE) {
+            error_log("Invalid JSON from query server: $result");
+            return false;
+        }
+
+        return json_encode($decoded);
+
+    } catch (Exception $e) {
+        error_log("Error calling query server: " . $e->getMessage());
+        return callPythonScript($scriptPath, $args);
+    }
+}
+
 ?>